@@ -0,0 +1,176 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Benchmark of blog search.
+
+Generates posts in a SQLite database and times the fts SearchManager
+against search_posts over the PostTerm index, for the first page of results
+and for a page deep into them, as well as the cost the index adds to saving
+a post. Run from the root of a Pinax checkout::
+
+    python pinax/apps/blog/benchmarks.py --posts 100000 --repeat 5
+"""
+import optparse
+import os
+import random
+import sys
+import time
+
+# the repository root, so tests.runner is importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 3)))
+
+from tests.runner import setup_test_environment
+
+setup_test_environment()
+
+from django.conf import settings
+from django.db import connection, reset_queries
+
+from django.contrib.auth.models import User
+
+from pinax.apps.blog.models import Post, PostTerm
+from pinax.apps.blog.search import search_posts
+
+POSTS = 100000
+REPEAT = 5
+PAGE_SIZE = 20
+DEEP_PAGE = 10
+WORDS = 5000
+BATCH_SIZE = 500
+LANGUAGE = "en"
+
+QUERIES = [
+    "word1",
+    "word1 word2",
+    "word4999",
+]
+
+
+def bulk_create(model, objects):
+    for i in range(0, len(objects), BATCH_SIZE):
+        model.objects.bulk_create(objects[i:i + BATCH_SIZE])
+
+
+def text(length):
+    # low word numbers are the common ones, like in real text
+    return " ".join(
+        "word{0}".format(int(random.paretovariate(1)) % WORDS)
+        for i in range(length)
+    )
+
+
+def generate(size):
+    """
+    fill the database with size public posts and index them for both the
+    SearchManager and search_posts.
+    """
+    random.seed(size)
+    author = User.objects.create(username="author", email="author@example.com")
+    posts = []
+    for i in range(size):
+        posts.append(Post(
+            title=text(6),
+            slug="post-{0}".format(i),
+            author=author,
+            tease=text(30),
+            body=text(300),
+            language=LANGUAGE,
+            updated_at=author.date_joined,
+        ))
+    bulk_create(Post, posts)
+
+    # bulk_create skips save(), so fill both indexes by hand
+    terms = []
+    for post in Post.objects.order_by("pk").iterator():
+        for term, weight in PostTerm.objects.weights(post).items():
+            terms.append(PostTerm(post_id=post.pk, language=post.language, term=term, weight=weight))
+        if len(terms) >= BATCH_SIZE * 10:
+            bulk_create(PostTerm, terms)
+            terms = []
+    bulk_create(PostTerm, terms)
+    if hasattr(Post.objects, "update_index"):
+        Post.objects.update_index()
+    return Post.objects.order_by("pk")[0]
+
+
+def measure(func, repeat=REPEAT):
+    """
+    run func repeat times and return the median wall time in milliseconds and
+    the largest number of queries of a run.
+    """
+    times = []
+    queries = 0
+    for i in range(repeat):
+        reset_queries()
+        started = time.time()
+        func()
+        times.append((time.time() - started) * 1000)
+        queries = max(queries, len(connection.queries))
+    times.sort()
+    return times[len(times) // 2], queries
+
+
+def benchmarks(post):
+    posts = Post.objects.filter(status=2, language=LANGUAGE)
+
+    def fts_page(query, page):
+        def search():
+            start = page * PAGE_SIZE
+            list(Post.objects.search(query).filter(
+                status=2, language=LANGUAGE
+            ).select_related(depth=1).order_by("-publish")[start:start + PAGE_SIZE])
+        return search
+
+    def indexed_page(query, page):
+        after = None
+        for i in range(page):
+            after = search_posts(query, posts, after, PAGE_SIZE, LANGUAGE).next_key
+            if after is None:
+                break
+
+        def search():
+            search_posts(query, posts, after, PAGE_SIZE, LANGUAGE)
+        return search
+
+    def save():
+        post.body = text(300)
+        post.save()
+
+    tests = []
+    for query in QUERIES:
+        for page in (0, DEEP_PAGE):
+            tests.append(("fts {0!r} page {1}".format(query, page + 1), fts_page(query, page)))
+            tests.append(("indexed {0!r} page {1}".format(query, page + 1), indexed_page(query, page)))
+    tests.append(("save", save))
+    return tests
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--posts",
+        dest="posts",
+        default=POSTS,
+        type="int",
+        help="number of posts to generate",
+    )
+    parser.add_option("--repeat",
+        dest="repeat",
+        default=REPEAT,
+        type="int",
+        help="runs of each benchmark; the median time is reported",
+    )
+    options, args = parser.parse_args()
+
+    settings.DEBUG = True  # record queries
+    old_name = settings.DATABASES["default"]["NAME"]
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        post = generate(options.posts)
+        for name, func in benchmarks(post):
+            ms, queries = measure(func, options.repeat)
+            sys.stdout.write("{0:<36} {1:>10.2f}ms {2:>4} queries\n".format(name, ms, queries))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ def blog_invalidator(*a, **kw):
     obj = kw['instance']
     tags = []
     tags.append('blog.post.pk:{0}'.format(obj.pk))
+    tags.append('blog.feeds')
     return tags
 
 caches = [
@@ -0,0 +1,92 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Notifies the friends of an author about a published post.
+
+The request only queues a job. The worker reads the author's friends in
+chunks of primary keys, sends each chunk the blog_friend_post notice and
+only then marks the post announced, so of several jobs for the same post in
+a process only one announces it. A post is announced once, the first time
+it is saved as public, so later edits don't notify anyone again.
+
+Jobs run on daemon threads and aren't stored anywhere: a job lost to a
+restart, or failing part way through, leaves the post unannounced. Its next
+save queues it again, and the announce_posts command announces every public
+post that wasn't; friends of the chunks sent before a failure then get the
+notice twice, rather than others missing it.
+"""
+import threading
+
+from django.conf import settings
+from django.db.models import Q
+
+from django.contrib.auth.models import User
+
+if "notification" in settings.INSTALLED_APPS:
+    from notification import models as notification
+else:
+    notification = None
+try:
+    from friends.models import Friendship
+except ImportError:
+    Friendship = None
+
+from pinax.apps.blog.models import Post
+from pinax.utils.workers import WorkerPool, chunks
+
+NOTIFICATION_WORKERS = getattr(settings, "BLOG_NOTIFICATION_WORKERS", 2)
+NOTIFICATION_CHUNK_SIZE = getattr(settings, "BLOG_NOTIFICATION_CHUNK_SIZE", 500)
+
+pool = WorkerPool(NOTIFICATION_WORKERS)
+
+
+def friends(user, chunk_size=None):
+    """Iterates over lists of the friends of user, reading them in primary
+    key order one chunk at a time."""
+    if chunk_size is None:
+        chunk_size = NOTIFICATION_CHUNK_SIZE
+    return chunks(User.objects.filter(
+        Q(pk__in=Friendship.objects.filter(from_user=user).values("to_user")) |
+        Q(pk__in=Friendship.objects.filter(to_user=user).values("from_user"))
+    ), chunk_size)
+
+
+# the posts a job of this process is announcing
+announcing = set()
+announcing_lock = threading.Lock()
+
+
+def claim(post_id):
+    """Reserves a post for the calling job; returns False when another job
+    of this process is announcing it."""
+    with announcing_lock:
+        if post_id in announcing:
+            return False
+        announcing.add(post_id)
+        return True
+
+
+def announce(post_id):
+    """Notifies the friends of the author of a public post that wasn't
+    announced yet, then marks it announced; returns whether it did."""
+    if not claim(post_id):
+        return False
+    try:
+        posts = Post.objects.filter(pk=post_id, status=2, friends_notified=False)
+        for post in posts.select_related("author"):
+            for users in friends(post.author):
+                notification.send(users, "blog_friend_post", {"post": post})
+            return posts.update(friends_notified=True) == 1
+        return False
+    finally:
+        with announcing_lock:
+            announcing.discard(post_id)
+
+
+def publish(post):
+    """Queues the notice of a post for the friends of its author, unless
+    the post isn't public or they were told about it before."""
+    if notification is None or Friendship is None:
+        return
+    if post.status != 2 or post.friends_notified:
+        return
+    pool.submit(announce, post.pk)
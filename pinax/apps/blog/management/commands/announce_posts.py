@@ -0,0 +1,19 @@
+from __future__ import absolute_import, unicode_literals
+from django.core.management.base import NoArgsCommand
+
+from pinax.apps.blog import fanout
+from pinax.apps.blog.models import Post
+
+
+class Command(NoArgsCommand):
+
+    help = "Notifies the friends of their authors about public posts that weren't announced yet"
+
+    def handle_noargs(self, **options):
+        count = 0
+        if fanout.notification is not None and fanout.Friendship is not None:
+            posts = Post.objects.filter(status=2, friends_notified=False)
+            for post_id in list(posts.values_list("pk", flat=True)):
+                if fanout.announce(post_id):
+                    count += 1
+        self.stdout.write("Announced {0} posts\n".format(count))
@@ -0,0 +1,16 @@
+from __future__ import absolute_import, unicode_literals
+from django.core.management.base import NoArgsCommand
+
+from pinax.apps.blog.models import Post, PostTerm
+
+
+class Command(NoArgsCommand):
+
+    help = "Brings the search index of all blog posts up to date"
+
+    def handle_noargs(self, **options):
+        count = 0
+        for post in Post.objects.all().iterator():
+            PostTerm.objects.index(post)
+            count += 1
+        self.stdout.write("Indexed {0} posts\n".format(count))
@@ -0,0 +1,24 @@
+from __future__ import absolute_import, unicode_literals
+from django.core.management.base import NoArgsCommand
+
+from pinax.apps.blog.models import Post
+
+
+class Command(NoArgsCommand):
+
+    help = "Re-renders the HTML and permalink of every blog post, e.g. after markup engines change"
+
+    def handle_noargs(self, **options):
+        count = 0
+        for post in Post.objects.select_related("author").iterator():
+            post.render()
+            post.permalink = post.build_permalink()
+            # update() rather than save(), so updated_at and the search index
+            # are left alone
+            Post.objects.filter(pk=post.pk).update(
+                body_html=post.body_html,
+                tease_html=post.tease_html,
+                permalink=post.permalink
+            )
+            count += 1
+        self.stdout.write("Rendered {0} posts\n".format(count))
@@ -15,7 +15,10 @@ from django.utils.translation import ugettext_lazy as _
 import fts
 from cache_tagging.django_cache_tagging import cache
 from django_markup.markup import formatter
+from pinax.utils.feeds import touch_feeds
+from pinax.utils.fields import KeptBooleanField
 from pinax.utils.helper import helper
+from pinax.utils.search import TermManager
 from tagging.fields import TagField
 from tagging.models import Tag
 from threadedcomments.models import ThreadedComment
@@ -38,6 +41,28 @@ except NameError:
 MARKUP_CHOICES = getattr(settings, "MARKUP_CHOICES", [])
 
 
+class PostManager(fts_ext.SearchManager):
+
+    def get_by_permalink(self, username, year, month, slug, language):
+        """Returns the post at a permalink, or None, with one query using
+        the (author, language, publish, slug) index."""
+        start = datetime(year, month, 1)
+        if month == 12:
+            end = datetime(year + 1, 1, 1)
+        else:
+            end = datetime(year, month + 1, 1)
+        posts = self.select_related("author").filter(
+            author__username=username,
+            language=language,
+            publish__gte=start,
+            publish__lt=end,
+            slug=slug
+        ).order_by("-publish")[:1]
+        for post in posts:
+            return post
+        return None
+
+
 class Post(fts.SearchableModel):
     """A model which holds a single post."""
 
@@ -123,8 +148,32 @@ class Post(fts.SearchableModel):
     )
     group = generic.GenericForeignKey('content_type', 'object_id')
     tags = TagField()
+    # rendered from body and tease on save; see render()
+    body_html = models.TextField(
+        editable=False,
+        blank=True
+    )
+    tease_html = models.TextField(
+        editable=False,
+        blank=True
+    )
+    # set once the author's friends were told about the post, only by
+    # fanout.announce; saving a post leaves it alone
+    friends_notified = KeptBooleanField(
+        default=False,
+        editable=False
+    )
+    # the path of get_absolute_url, built on save
+    permalink = models.CharField(
+        max_length=255,
+        editable=False,
+        blank=True
+    )
 
-    objects = fts_ext.SearchManager(fields=('title', 'tease', 'body'))
+    # the fts index is still written on every save, although searches use
+    # PostTerm unless BLOG_INDEXED_SEARCH is off: it is what that setting
+    # falls back to, and it must be current the moment it is switched off
+    objects = PostManager(fields=('title', 'tease', 'body'))
 
     class Meta:
         verbose_name = _("post")
@@ -137,40 +186,44 @@ class Post(fts.SearchableModel):
 
     def save(self, **kwargs):
         self.updated_at = datetime.now()
+        self.render()
+        self.permalink = self.build_permalink()
         super(Post, self).save(**kwargs)
+        PostTerm.objects.index(self, language=self.language)
+
+    def render(self):
+        """Renders body and tease into body_html and tease_html."""
+        self.body_html = formatter(self.body, self.markup)
+        if self.tease:
+            self.tease_html = formatter(self.tease, self.markup)
+        else:
+            self.tease_html = truncatewords_html(self.body_html, 150)
 
     def get_absolute_url(self):
+        # permalinks are stored without the script prefix, which depends on
+        # where the site is served from
+        return urlresolvers.get_script_prefix() + (self.permalink or self.build_permalink())
+
+    def build_permalink(self):
+        """Returns the path of the post relative to the script prefix."""
         with translation.override(self.language):
-            return urlresolvers.reverse("blog_post", kwargs={
+            url = urlresolvers.reverse("blog_post", kwargs={
                 "username": self.author.username,
                 "year": self.publish.year,
                 "month": "{0:02d}".format(self.publish.month),
                 "slug": self.slug
             })
+        return url[len(urlresolvers.get_script_prefix()):]
 
+    # the stored renderings; posts saved before body_html existed are
+    # rendered by the render_posts command
     @property
     def body_rendered(self):
-        cache_key = "blog.post.pk:{0}.body.updated:{1}".format(
-            self.pk,
-            self.updated_at.isoformat()
-        )
-        return cache.get_or_set_callback(
-            cache_key,
-            lambda: formatter(self.body, self.markup),
-            timeout=5 * 3600,
-        )
+        return self.body_html
 
     @property
     def tease_rendered(self):
-        cache_key = "blog.post.pk:{0}.tease.updated:{1}".format(
-            self.pk,
-            self.updated_at.isoformat()
-        )
-        return cache.get_or_set_callback(
-            cache_key,
-            lambda: formatter((self.tease or truncatewords_html(self.body, 150)), self.markup),
-            timeout=5 * 3600,
-        )
+        return self.tease_html
 
     def is_allowed(self, user, perm=None):
         """Checks permissions."""
@@ -193,6 +246,53 @@ class Post(fts.SearchableModel):
         return False
 
 
+class PostTermManager(TermManager):
+
+    object_field = "post"
+    # how much an occurrence of a term counts in each field
+    FIELD_WEIGHTS = (
+        ("title", 10),
+        ("tease", 3),
+        ("body", 1),
+    )
+
+
+class PostTerm(models.Model):
+    """An entry of the inverted index used to search posts: a term and
+    how much of the post it makes up, kept per language."""
+    post = models.ForeignKey(Post, related_name="terms")
+    language = models.CharField(max_length=10, db_index=True)
+    term = models.CharField(max_length=50, db_index=True)
+    weight = models.PositiveIntegerField()
+
+    objects = PostTermManager()
+
+
+def author_saved(sender, instance, created, **kwargs):
+    # permalinks contain the username of the author; a rename shows as the
+    # stored permalink of a post no longer matching, so other saves of a
+    # user only look at one post
+    if created:
+        return
+    posts = Post.objects.filter(author=instance)
+    first = list(posts.order_by()[:1])
+    if not first:
+        return
+    first[0].author = instance
+    if first[0].permalink == first[0].build_permalink():
+        return
+    tags = []
+    for post in posts.iterator():
+        post.author = instance
+        permalink = post.build_permalink()
+        if permalink != post.permalink:
+            # updated_at stays, as the post itself didn't change
+            Post.objects.filter(pk=post.pk).update(permalink=permalink)
+            tags.append("blog.post.pk:{0}".format(post.pk))
+    cache.invalidate_tags(*tags)
+    touch_feeds("blog.feeds")
+
+
 def subscribe_creator(sender, instance, created, **kwargs):
     if notification and created and isinstance(instance, Post):
         signal = notice_type_label = "blog_post_comment"
@@ -229,6 +329,8 @@ def object_comment(sender, instance, created, **kwargs):
                 }
             )
 
+models.signals.post_save.connect(author_saved, sender=User)
+
 if notification is not None:
     models.signals.post_save.connect(subscribe_creator, sender=Post)
     models.signals.post_save.connect(object_comment, sender=ThreadedComment)
@@ -0,0 +1,82 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Ranked search of blog posts over the PostTerm inverted index.
+
+A post matches when it has every term of the query; matches are ranked by
+the summed weight of those terms, title words counting above tease words
+above body words. Results are paged by key rather than by offset: a page
+ends with the key of its last post, and the next page starts after it, so
+deep pages cost as much as the first one.
+"""
+from django.utils import translation
+
+from pinax.apps.blog.models import PostTerm
+from pinax.utils.search import search_terms
+
+SEARCH_PAGE_SIZE = 20
+
+
+class SearchPage(object):
+    """A page of posts matching a query, in rank order.
+
+    next_key is passed as after to get the following page; it is None on
+    the last page.
+    """
+
+    def __init__(self, posts, next_key):
+        self.posts = posts
+        self.next_key = next_key
+
+    def __len__(self):
+        return len(self.posts)
+
+    def __iter__(self):
+        return iter(self.posts)
+
+
+def page_key(score, pk):
+    return "{0}-{1}".format(score, pk)
+
+
+def parse_page_key(key):
+    """Returns the (score, pk) of a page key; raises ValueError when it
+    isn't one."""
+    score, pk = key.split("-")
+    return int(score), int(pk)
+
+
+def search_posts(query, posts, after=None, limit=SEARCH_PAGE_SIZE, language=None):
+    """Searches posts, a queryset of the posts that may be found, for query.
+
+    Returns the SearchPage of at most limit posts following the page key
+    after, in the given language or the active one. The posts get a
+    search_score attribute.
+    """
+    terms = set(search_terms(query))
+    if not terms:
+        return SearchPage([], None)
+    if language is None:
+        language = translation.get_language()
+    ranked = PostTerm.objects.matches(terms, posts, language=language)
+
+    # one more row than asked, to know whether there is a next page
+    if after is None:
+        rows = list(ranked.order_by("-score", "-post")[:limit + 1])
+    else:
+        score, pk = parse_page_key(after)
+        rows = list(ranked.filter(score=score, post__lt=pk).order_by("-post")[:limit + 1])
+        if len(rows) <= limit:
+            rows.extend(ranked.filter(score__lt=score).order_by("-score", "-post")[:limit + 1 - len(rows)])
+
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = page_key(rows[-1]["score"], rows[-1]["post"])
+
+    found = posts.select_related("author").in_bulk([row["post"] for row in rows])
+    results = []
+    for row in rows:
+        post = found[row["post"]]
+        post.search_score = row["score"]
+        results.append(post)
+    return SearchPage(results, next_key)
@@ -0,0 +1,4 @@
+-- permalinks are looked up by author, language, publish month and slug;
+-- unquoted names, which every backend reads
+
+CREATE INDEX blog_post_permalink ON blog_post (author_id, language, publish, slug);
@@ -0,0 +1,277 @@
+from __future__ import absolute_import, unicode_literals
+import time
+from datetime import datetime
+from io import StringIO
+
+from django.conf.urls.defaults import *
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from friends.models import Friendship
+
+from pinax.apps.blog import fanout
+from pinax.apps.blog.feeds import BlogFeedAll, BlogFeedUser
+from pinax.apps.blog.models import Post, PostTerm
+from pinax.apps.blog.search import search_posts
+from pinax.utils.feeds import timestamp
+
+urlpatterns = patterns("",
+    url(r"^blog/", include("pinax.apps.blog.urls")),
+    url(r"^feeds/posts/(.*)/$", "pinax.utils.feeds.feed", {"feed_dict": {
+        "all": BlogFeedAll,
+        "only": BlogFeedUser,
+    }}),
+)
+
+
+class BlogTest(TestCase):
+    urls = "pinax.apps.blog.tests"
+
+    def setUp(self):
+        self.user = User.objects.create_user("blogger", "blogger@example.com", "secret")
+
+    def post(self, **kwargs):
+        values = {
+            "title": "A post",
+            "slug": "a-post",
+            "author": self.user,
+            "body": "The body of a post.",
+        }
+        values.update(kwargs)
+        post = Post(**values)
+        post.save()
+        return post
+
+
+class FeedTest(BlogTest):
+
+    def test_timestamp(self):
+        # naive datetimes are local time, not UTC
+        now = int(time.time())
+        self.assertEqual(timestamp(datetime.fromtimestamp(now)), now)
+
+    def test_conditional_get(self):
+        self.post()
+        for url in ["/feeds/posts/all/", "/feeds/posts/only/blogger/"]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(response.status_code, 304)
+
+    def test_post_save_changes_the_feed(self):
+        post = self.post()
+        url = "/feeds/posts/all/"
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        post.title = "A changed post"
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertTrue("A changed post" in response.content.decode("utf-8"))
+
+
+class RenderTest(BlogTest):
+
+    def test_rendered_on_save(self):
+        post = self.post(body="A *body*.", tease="", markup="markdown")
+        self.assertTrue("<em>body</em>" in post.body_html)
+        # without a tease, the body is teased
+        self.assertEqual(post.tease_html, post.body_html)
+
+        post.tease = "A *tease*."
+        post.save()
+        post = Post.objects.get(pk=post.pk)
+        self.assertTrue("<em>tease</em>" in post.tease_html)
+        self.assertEqual(post.tease_rendered, post.tease_html)
+
+    def test_render_posts(self):
+        post = self.post(body="A *body*.", markup="markdown")
+        Post.objects.filter(pk=post.pk).update(body_html="", tease_html="", permalink="")
+
+        out = StringIO()
+        call_command("render_posts", stdout=out)
+        self.assertEqual(out.getvalue(), "Rendered 1 posts\n")
+        rendered = Post.objects.get(pk=post.pk)
+        self.assertEqual(rendered.body_html, post.body_html)
+        self.assertEqual(rendered.tease_html, post.tease_html)
+        self.assertEqual(rendered.permalink, post.permalink)
+
+
+class PermalinkTest(BlogTest):
+
+    def test_get_by_permalink(self):
+        november = self.post(slug="november", publish=datetime(2011, 11, 30, 23, 0))
+        december = self.post(slug="december", publish=datetime(2011, 12, 31, 23, 0))
+        january = self.post(slug="december", publish=datetime(2012, 1, 1, 0, 0))
+        posts, language = Post.objects, november.language
+        self.assertEqual(posts.get_by_permalink("blogger", 2011, 11, "november", language), november)
+        self.assertEqual(posts.get_by_permalink("blogger", 2011, 12, "december", language), december)
+        self.assertEqual(posts.get_by_permalink("blogger", 2012, 1, "december", language), january)
+        self.assertEqual(posts.get_by_permalink("blogger", 2011, 12, "november", language), None)
+        self.assertEqual(posts.get_by_permalink("blogger", 2011, 12, "december", "xx"), None)
+        self.assertEqual(posts.get_by_permalink("someone", 2011, 12, "december", language), None)
+
+    def test_permalink_without_script_prefix(self):
+        post = self.post(publish=datetime(2011, 12, 1))
+        self.assertEqual(post.get_absolute_url(), "/blog/post/blogger/2011/12/a-post/")
+        self.assertEqual(post.permalink, "blog/post/blogger/2011/12/a-post/")
+
+    def test_rename(self):
+        post = self.post(publish=datetime(2011, 12, 1))
+        response = self.client.get("/feeds/posts/all/")
+        etag = response["ETag"]
+
+        # saving the user otherwise leaves the posts alone
+        self.user.last_login = datetime.now()
+        self.user.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).updated_at, post.updated_at)
+
+        self.user.username = "writer"
+        self.user.save()
+        renamed = Post.objects.get(pk=post.pk)
+        self.assertEqual(renamed.updated_at, post.updated_at)
+        post = renamed
+        self.assertEqual(post.get_absolute_url(), "/blog/post/writer/2011/12/a-post/")
+        self.assertEqual(Post.objects.get_by_permalink("writer", 2011, 12, "a-post", post.language), post)
+        response = self.client.get("/feeds/posts/all/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue("/blog/post/writer/2011/12/a-post/" in response.content.decode("utf-8"))
+
+
+class SearchTest(BlogTest):
+
+    def test_paging(self):
+        posts = [
+            self.post(title="Post {0}".format(i), slug="post-{0}".format(i),
+                      body="About gardening.")
+            for i in range(5)
+        ]
+        best = self.post(title="Gardening", slug="gardening", body="About gardening.")
+        self.post(title="Cooking", slug="cooking", body="About cooking.")
+
+        found = []
+        page = search_posts("gardening", Post.objects.all(), limit=2, language=best.language)
+        found.extend(page)
+        while page.next_key is not None:
+            self.assertEqual(len(page), 2)
+            page = search_posts("gardening", Post.objects.all(), after=page.next_key,
+                                limit=2, language=best.language)
+            found.extend(page)
+        self.assertEqual(found[0], best)
+        self.assertEqual(sorted(post.pk for post in found[1:]), [post.pk for post in posts])
+        self.assertRaises(ValueError, search_posts, "gardening", Post.objects.all(),
+                          after="nonsense")
+
+    def test_language(self):
+        post = self.post(body="About gardening.")
+        other = self.post(slug="jardinage", body="About gardening.", language="fr")
+        page = search_posts("gardening", Post.objects.all(), language=post.language)
+        self.assertEqual(list(page), [post])
+        page = search_posts("gardening", Post.objects.all(), language="fr")
+        self.assertEqual(list(page), [other])
+
+        other.language = post.language
+        other.save()
+        page = search_posts("gardening", Post.objects.all(), language=post.language)
+        self.assertEqual(sorted(found.pk for found in page), [post.pk, other.pk])
+
+    def test_index_follows_edits(self):
+        post = self.post(body="About gardening.")
+        post.body = "About cooking."
+        post.save()
+        self.assertEqual(
+            dict(PostTerm.objects.filter(post=post).values_list("term", "weight")),
+            {"post": 10, "about": 1, "cooking": 1}
+        )
+        self.assertEqual(len(search_posts("gardening", Post.objects.all(), language=post.language)), 0)
+
+
+class Notices(object):
+    """Records what fanout sends instead of sending it."""
+
+    def __init__(self, fail_after=None):
+        self.sent = []
+        self.fail_after = fail_after
+
+    def send(self, users, label, extra_context):
+        if len(self.sent) == self.fail_after:
+            raise IOError("Delivery failed")
+        self.sent.append((label, extra_context["post"].pk, [user.pk for user in users]))
+
+
+class FanoutTest(BlogTest):
+
+    def setUp(self):
+        super(FanoutTest, self).setUp()
+        self.notification = fanout.notification
+        fanout.notification = self.notices = Notices()
+        self.friends = []
+        for i in range(5):
+            friend = User.objects.create_user("friend{0}".format(i), "friend{0}@example.com".format(i))
+            # friendships go both ways
+            if i % 2:
+                Friendship.objects.create(from_user=self.user, to_user=friend)
+            else:
+                Friendship.objects.create(from_user=friend, to_user=self.user)
+            self.friends.append(friend.pk)
+        User.objects.create_user("stranger", "stranger@example.com")
+
+    def tearDown(self):
+        fanout.notification = self.notification
+
+    def test_friends_in_chunks(self):
+        chunks = list(fanout.friends(self.user, chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([user.pk for chunk in chunks for user in chunk], sorted(self.friends))
+
+    def test_announced_once(self):
+        self.assertEqual(fanout.pool.size, 0)
+        post = self.post()
+        fanout.publish(post)
+        self.assertEqual(self.notices.sent, [
+            ("blog_friend_post", post.pk, sorted(self.friends)),
+        ])
+
+        # an edit, even from an instance read before the announcement
+        stale = Post.objects.get(pk=post.pk)
+        stale.friends_notified = False
+        post.title = "An edited post"
+        post.save()
+        fanout.publish(post)
+        stale.save()
+        fanout.publish(stale)
+        self.assertEqual(len(self.notices.sent), 1)
+        self.assertTrue(Post.objects.get(pk=post.pk).friends_notified)
+
+    def test_draft_published_later(self):
+        post = self.post(status=1)
+        fanout.publish(post)
+        self.assertEqual(self.notices.sent, [])
+
+        post.status = 2
+        post.save()
+        fanout.publish(post)
+        self.assertEqual(len(self.notices.sent), 1)
+
+    def test_failed_delivery(self):
+        fanout.notification = Notices(fail_after=1)
+        chunk_size, fanout.NOTIFICATION_CHUNK_SIZE = fanout.NOTIFICATION_CHUNK_SIZE, 2
+        try:
+            post = self.post()
+            self.assertRaises(IOError, fanout.publish, post)
+            self.assertFalse(Post.objects.get(pk=post.pk).friends_notified)
+
+            # announce_posts sends it again, to every friend
+            fanout.notification = self.notices
+            call_command("announce_posts", stdout=StringIO())
+            self.assertEqual([pk for sent in self.notices.sent for pk in sent[2]], sorted(self.friends))
+            self.assertTrue(Post.objects.get(pk=post.pk).friends_notified)
+        finally:
+            fanout.NOTIFICATION_CHUNK_SIZE = chunk_size
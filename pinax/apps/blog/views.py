@@ -11,26 +11,22 @@ from django.contrib import messages
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 
+from pinax.apps.blog import fanout
 from pinax.apps.blog.models import Post
 from pinax.apps.blog.forms import BlogForm, BlogSearchForm
+from pinax.apps.blog.search import search_posts
 
-if "notification" in settings.INSTALLED_APPS:
-    from notification import models as notification
-else:
-    notification = None
-try:
-    from friends.models import Friendship
-    friends = True
-except ImportError:
-    friends = False
+# search the PostTerm index rather than with fts' SearchManager
+BLOG_INDEXED_SEARCH = getattr(settings, "BLOG_INDEXED_SEARCH", True)
 
 
 def blogs(request, username=None, template_name="blog/blogs.html"):
     form = BlogSearchForm(request.GET or None)
     if form.is_bound and not form.is_valid():
         raise Http404
-    if form.is_bound and form.cleaned_data.get('text'):
-        blogs = Post.objects.search(form.cleaned_data['text'])
+    text = form.is_bound and form.cleaned_data.get('text')
+    if text and not BLOG_INDEXED_SEARCH:
+        blogs = Post.objects.search(text)
     else:
         blogs = Post.objects.all()
     blogs = blogs.filter(
@@ -40,29 +36,34 @@ def blogs(request, username=None, template_name="blog/blogs.html"):
     if username is not None:
         user = get_object_or_404(User, username=username)
         blogs = blogs.filter(author=user)
+    search_page = None
+    if text and BLOG_INDEXED_SEARCH:
+        try:
+            search_page = blogs = search_posts(
+                text, blogs, after=request.GET.get('after')
+            )
+        except ValueError:
+            raise Http404
     return render_to_response(template_name, {
         "blogs": blogs,
+        "search_page": search_page,
         'form': form,
     }, context_instance=RequestContext(request))
 
 
 def post(request, username, year, month, slug,
          template_name="blog/post.html"):
-    post = Post.objects.filter(
-        slug=slug,
-        language=get_language(),
-        publish__year=int(year),
-        publish__month=int(month),
-        author__username=username
+    post = Post.objects.get_by_permalink(
+        username, int(year), int(month), slug, get_language()
     )
-    if not post:
+    if post is None:
         raise Http404
 
-    if post[0].status == 1 and post[0].author != request.user:
+    if post.status == 1 and post.author != request.user:
         raise Http404
 
     return render_to_response(template_name, {
-        "post": post[0],
+        "post": post,
     }, context_instance=RequestContext(request))
 
 
@@ -112,10 +113,7 @@ def new(request, form_class=BlogForm, template_name="blog/new.html"):
                     request, messages.SUCCESS,
                     ugettext("Successfully saved post '%s'") % blog.title
                 )
-                if notification:
-                    if blog.status == 2:  # published
-                        if friends:  # @@@ might be worth having a shortcut for sending to all friends
-                            notification.send((x['friend'] for x in Friendship.objects.friends_for_user(blog.author)), "blog_friend_post", {"post": blog})
+                fanout.publish(blog)
 
                 return HttpResponseRedirect(reverse("blog_list_yours"))
         else:
@@ -145,10 +143,7 @@ def edit(request, id, form_class=BlogForm, template_name="blog/edit.html"):
                     request, messages.SUCCESS,
                     ugettext("Successfully updated post '%s'") % blog.title
                 )
-                if notification:
-                    if blog.status == 2:  # published
-                        if friends:  # @@@ might be worth having a shortcut for sending to all friends
-                            notification.send((x['friend'] for x in Friendship.objects.friends_for_user(blog.author)), "blog_friend_post", {"post": blog})
+                fanout.publish(blog)
 
                 return HttpResponseRedirect(reverse("blog_list_yours"))
         else:
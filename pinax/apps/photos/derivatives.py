@@ -0,0 +1,217 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Fixed size renditions of photos.
+
+The renditions of RENDITIONS are generated together, when a photo is
+uploaded or else the first time one of them is asked for, and stored under
+a name made of the SHA-1 of the original file and the rendition's size,
+crop and quality. The digest is kept on the Image, so finding a rendition
+doesn't touch the original. Whether a rendition exists in the storage is
+remembered in the cache; changing PHOTOS_RENDITIONS renames the renditions,
+which are then generated again the first time they are shown, or all at
+once by the regenerate_derivatives command. Regenerating many photos
+resizes them in a process pool.
+"""
+import hashlib
+import logging
+import multiprocessing
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from cache_tagging.django_cache_tagging import cache
+
+try:
+    from PIL import Image as PILImage, ImageOps
+except ImportError:
+    import Image as PILImage
+    import ImageOps
+
+logger = logging.getLogger(__name__)
+
+# name: (width, height, crop, JPEG quality); a height of 0 keeps the aspect
+# ratio, and cropped renditions are cut around the photo's crop_from anchor
+RENDITIONS = getattr(settings, "PHOTOS_RENDITIONS", {
+    "thumbnail": (100, 75, True, 70),
+    "display": (400, 0, False, 80),
+})
+DERIVATIVES_DIR = getattr(settings, "PHOTOS_DERIVATIVES_DIR", "photologue/derivatives")
+# None uses one process per CPU
+DERIVATIVE_PROCESSES = getattr(settings, "PHOTOS_DERIVATIVE_PROCESSES", None)
+# originals read into memory at once when generating many photos
+DERIVATIVE_BATCH_SIZE = getattr(settings, "PHOTOS_DERIVATIVE_BATCH_SIZE", 50)
+# how long the cache remembers that a rendition exists
+RENDITION_CACHE_TIMEOUT = getattr(settings, "PHOTOS_RENDITION_CACHE_TIMEOUT", 60 * 60 * 24)
+
+CROP_CENTERING = {
+    "top": (0.5, 0.0),
+    "right": (1.0, 0.5),
+    "bottom": (0.5, 1.0),
+    "left": (0.0, 0.5),
+    "center": (0.5, 0.5),
+}
+
+RESAMPLE = getattr(PILImage, "LANCZOS", None) or PILImage.ANTIALIAS
+
+
+def rendition_name(digest, name, crop_from):
+    width, height, crop, quality = RENDITIONS[name]
+    spec = "{0}x{1}-q{2}".format(width, height, quality)
+    if crop:
+        spec = "{0}-{1}".format(spec, crop_from or "center")
+    return "{0}/{1}/{2}-{3}.jpg".format(DERIVATIVES_DIR, digest[:2], digest, spec)
+
+
+def resize(data, crop_from):
+    """
+    Returns the JPEG data of every rendition of the original image data, by
+    rendition name. It runs in worker processes, so it only deals in bytes.
+    """
+    original = PILImage.open(BytesIO(data))
+    original.load()
+    if original.mode not in ("RGB", "L"):
+        original = original.convert("RGB")
+    renditions = {}
+    for name, (width, height, crop, quality) in RENDITIONS.items():
+        if crop:
+            image = ImageOps.fit(original, (width, height), RESAMPLE,
+                                 centering=CROP_CENTERING.get(crop_from, (0.5, 0.5)))
+        else:
+            image = original.copy()
+            image.thumbnail((width, height or original.size[1]), RESAMPLE)
+        out = BytesIO()
+        image.save(out, "JPEG", quality=quality)
+        renditions[name] = out.getvalue()
+    return renditions
+
+
+def _resize(args):
+    # a broken original must not take the rest of its batch down
+    try:
+        return resize(*args)
+    except (IOError, ValueError):
+        return None
+
+
+def read(image):
+    """Returns the data of the original of an image and its digest."""
+    image.image.open("rb")
+    try:
+        data = image.image.read()
+    finally:
+        image.image.close()
+    return data, hashlib.sha1(data).hexdigest()
+
+
+def rendition_cache_key(path):
+    return "photos.rendition:{0}".format(hashlib.md5(path.encode("utf-8")).hexdigest())
+
+
+def rendition_exists(path):
+    key = rendition_cache_key(path)
+    if cache.get(key):
+        return True
+    if default_storage.exists(path):
+        cache.set(key, True, timeout=RENDITION_CACHE_TIMEOUT)
+        return True
+    return False
+
+
+def store(image, digest, renditions):
+    for name, data in renditions.items():
+        path = rendition_name(digest, name, image.crop_from)
+        # same name, same content
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(data))
+        cache.set(rendition_cache_key(path), True, timeout=RENDITION_CACHE_TIMEOUT)
+    image.image_digest = digest
+    image.__class__.objects.filter(pk=image.pk).update(image_digest=digest)
+
+
+def generate(image):
+    """Generates the renditions of an image in this process."""
+    data, digest = read(image)
+    store(image, digest, resize(data, image.crop_from))
+
+
+def try_generate(image):
+    """
+    Generates the renditions of an image, logging rather than raising when
+    its original can't be read or resized. Returns whether it did.
+    """
+    try:
+        generate(image)
+    except (IOError, ValueError):
+        logger.exception("could not generate the renditions of image %s", image.pk)
+        return False
+    return True
+
+
+def generate_many(images, processes=DERIVATIVE_PROCESSES):
+    """
+    Generates the renditions of images, resizing them in a pool of
+    processes. Returns the number of images done.
+    """
+    # the workers don't use the database; don't share its connection
+    connection.close()
+    pool = multiprocessing.Pool(processes)
+    count = 0
+    try:
+        batch = []
+        for image in images:
+            if image.image:
+                batch.append(image)
+            if len(batch) >= DERIVATIVE_BATCH_SIZE:
+                count += _generate_batch(pool, batch)
+                batch = []
+        count += _generate_batch(pool, batch)
+    finally:
+        pool.close()
+        pool.join()
+    return count
+
+
+def _generate_batch(pool, images):
+    readable, originals = [], []
+    for image in images:
+        # a missing original must not take the rest of the run down either
+        try:
+            originals.append(read(image))
+        except IOError:
+            logger.exception("could not read the original of image %s", image.pk)
+            continue
+        readable.append(image)
+    images = readable
+    results = pool.map(_resize, [
+        (data, image.crop_from)
+        for image, (data, digest) in zip(images, originals)
+    ])
+    count = 0
+    for image, (data, digest), renditions in zip(images, originals, results):
+        if renditions is None:
+            logger.error("could not generate the renditions of image %s", image.pk)
+            continue
+        store(image, digest, renditions)
+        count += 1
+    return count
+
+
+def rendition_url(image, name):
+    """
+    Returns the URL of a rendition of an image, generating the renditions
+    when they don't exist yet. Never falls back to the original.
+    """
+    if not image.image:
+        return ""
+    if not image.image_digest and not try_generate(image):
+        return ""
+    path = rendition_name(image.image_digest, name, image.crop_from)
+    # made before PHOTOS_RENDITIONS changed, or deleted since
+    if not rendition_exists(path):
+        if not try_generate(image):
+            return ""
+        path = rendition_name(image.image_digest, name, image.crop_from)
+    return default_storage.url(path)
@@ -0,0 +1,33 @@
+from __future__ import absolute_import, unicode_literals
+import optparse
+
+from django.core.management.base import BaseCommand
+
+from pinax.apps.photos import derivatives
+from pinax.apps.photos.models import Image
+
+
+class Command(BaseCommand):
+
+    help = "Generates the fixed size renditions of photos, resizing in a process pool"
+
+    option_list = BaseCommand.option_list + (
+        optparse.make_option("--missing",
+            dest="missing",
+            action="store_true",
+            help="only photos whose renditions were never generated"
+        ),
+        optparse.make_option("--processes",
+            dest="processes",
+            type="int",
+            default=derivatives.DERIVATIVE_PROCESSES,
+            help="resizing processes, one per CPU by default"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        images = Image.objects.exclude(image="")
+        if options["missing"]:
+            images = images.filter(image_digest="")
+        count = derivatives.generate_many(images.iterator(), options["processes"])
+        self.stdout.write("Generated renditions of {0} photos\n".format(count))
@@ -11,6 +11,7 @@ from django.contrib.sites.models import Site
 from django.utils.translation import ugettext_lazy as _
 
 from groups.base import Group
+from pinax.utils.prefetch import PrefetchQuerySet, generic_objects
 from tagging.fields import TagField
 from threadedcomments.models import ThreadedComment
 
@@ -60,6 +61,26 @@ class PhotoSet(models.Model):
         return self.name
 
 
+class ImageQuerySet(PrefetchQuerySet):
+
+    def with_groups(self):
+        """
+        Resolves the group of the images with a constant number of queries
+        per chunk of images, instead of several queries per image for group,
+        get_absolute_url and is_allowed.
+        """
+        return self.prefetch(prefetch_groups)
+
+
+class ImageManager(models.Manager):
+
+    def get_query_set(self):
+        return ImageQuerySet(self.model, using=self._db)
+
+    def with_groups(self):
+        return self.get_query_set().with_groups()
+
+
 class Image(models.Model):
     """
     A photo with its details
@@ -105,13 +126,32 @@ class Image(models.Model):
         verbose_name=_("photo set")
     )
     tags = TagField()
+    # SHA-1 of the original, naming its renditions; see derivatives
+    image_digest = models.CharField(
+        max_length=40,
+        editable=False,
+        blank=True
+    )
+
+    objects = ImageManager()
+
+    def __init__(self, *args, **kwargs):
+        super(Image, self).__init__(*args, **kwargs)
+        self._rendered_from = (self.image.name, self.crop_from)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # a new original or crop needs new renditions
+        if (self.image.name, self.crop_from) != self._rendered_from:
+            self.image_digest = ""
+        super(Image, self).save(*args, **kwargs)
+        self._rendered_from = (self.image.name, self.crop_from)
+
     def get_absolute_url(self):
-        if self.group:
-            group = self.pool_set.all()[0].content_object
+        group = self.group
+        if group:
             return group.content_bridge.reverse(
                 'photo_details', group,
                 kwargs={'id': self.pk, }
@@ -120,12 +160,15 @@ class Image(models.Model):
 
     @property
     def group(self):
-        """Returns group"""
-        for pool in self.pool_set.all():
-            group = pool.content_object
-            if isinstance(group, Group):
-                return group
-        return None
+        """Returns group, resolved once per instance"""
+        if not hasattr(self, "_group_cache"):
+            self._group_cache = None
+            for pool in self.pool_set.all():
+                group = pool.content_object
+                if isinstance(group, Group):
+                    self._group_cache = group
+                    break
+        return self._group_cache
 
     def is_allowed(self, user, perm=None):
         """Checks permissions."""
@@ -201,6 +244,30 @@ class Pool(models.Model):
     def __str__(self):
         return str(self.content_object)
 
+def prefetch_groups(images):
+    """
+    Sets the group of each of images: one query for their pools and one per
+    type of object they are pooled in.
+    """
+    if not images:
+        return
+    pools = list(Pool.objects.filter(
+        photo__in=[image.pk for image in images]
+    ).order_by("pk").values_list("photo_id", "content_type_id", "object_id"))
+
+    objects = generic_objects(
+        ((content_type_id, object_id) for photo_id, content_type_id, object_id in pools),
+        base=Group
+    )
+
+    groups = {}
+    for photo_id, content_type_id, object_id in pools:
+        if photo_id not in groups and (content_type_id, object_id) in objects:
+            groups[photo_id] = objects[(content_type_id, object_id)]
+    for image in images:
+        image._group_cache = groups.get(image.pk)
+
+
 def subscribe_creator(sender, instance, created, **kwargs):
     if notification and created and isinstance(instance, Image):
         signal = notice_type_label = "photos_image_comment"
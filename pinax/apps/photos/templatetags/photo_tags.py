@@ -4,11 +4,21 @@ import re
 from django import template
 from django.utils.encoding import force_unicode
 
+from pinax.apps.photos.derivatives import rendition_url
 from pinax.apps.photos.models import Image, Pool
 
 register = template.Library()
 
 
+@register.filter
+def rendition(photo, name):
+    """
+    the URL of a fixed size rendition of photo, e.g. {{ photo|rendition:"thumbnail" }}
+    """
+    
+    return rendition_url(photo, name)
+
+
 class PrintExifNode(template.Node):
     
     def __init__(self, exif):
@@ -0,0 +1,215 @@
+from __future__ import absolute_import, unicode_literals
+from io import BytesIO
+
+from django.conf.urls import patterns, include, url
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core import urlresolvers
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.test import TestCase
+
+from cache_tagging.django_cache_tagging import cache
+
+from groups.base import Group
+from groups.bridge import ContentBridge
+from pinax.apps.photos import derivatives
+from pinax.apps.photos.derivatives import PILImage
+from pinax.apps.photos.models import Image, Pool
+
+
+class TestPhotoGroup(Group):
+    members = models.ManyToManyField(
+        User,
+        related_name="testphotogroups",
+    )
+
+    def get_absolute_url(self):
+        return urlresolvers.reverse(
+            "testphotogroup_detail",
+            kwargs={"group_slug": self.slug}
+        )
+
+bridge = ContentBridge(TestPhotoGroup)
+
+
+def testphotogroup(request, group_slug=None):
+    group = get_object_or_404(TestPhotoGroup, slug=group_slug)
+    return HttpResponse("<html><body>Group {0}.</body></html>".format(group.name))
+
+
+urlpatterns = patterns("",
+    url(r"^photos/", include("pinax.apps.photos.urls")),
+    url(r"^testphotogroup/(?P<group_slug>[-\w]+)/$", testphotogroup,
+        name="testphotogroup_detail"),
+)
+urlpatterns += bridge.include_urls(
+    "pinax.apps.photos.urls",
+    r"^testphotogroup/(?P<testphotogroup_slug>[-\w]+)/photos/"
+)
+
+
+def image_data(size=(640, 480), format="PNG"):
+    out = BytesIO()
+    PILImage.new("RGB", size, (200, 80, 40)).save(out, format)
+    return out.getvalue()
+
+
+class DerivativesTest(TestCase):
+
+    def setUp(self):
+        self.renditions = derivatives.RENDITIONS
+        derivatives.RENDITIONS = {
+            "thumbnail": (100, 75, True, 70),
+            "display": (400, 0, False, 80),
+        }
+        self.images = []
+
+    def tearDown(self):
+        derivatives.RENDITIONS = self.renditions
+        for image in self.images:
+            if image.image_digest:
+                directory = "{0}/{1}".format(derivatives.DERIVATIVES_DIR, image.image_digest[:2])
+                for name in default_storage.listdir(directory)[1]:
+                    if name.startswith(image.image_digest):
+                        path = "{0}/{1}".format(directory, name)
+                        default_storage.delete(path)
+                        cache.delete(derivatives.rendition_cache_key(path))
+            image.image.delete(save=False)
+
+    def image(self, data=None, **kwargs):
+        image = Image(title="A photo", title_slug="a-photo", **kwargs)
+        image.image.save("test.png", ContentFile(data or image_data()))
+        self.images.append(image)
+        return image
+
+    def test_rendition_name(self):
+        digest = "0123456789abcdef0123456789abcdef01234567"
+        self.assertEqual(
+            derivatives.rendition_name(digest, "thumbnail", "top"),
+            "{0}/01/{1}-100x75-q70-top.jpg".format(derivatives.DERIVATIVES_DIR, digest)
+        )
+        self.assertEqual(
+            derivatives.rendition_name(digest, "thumbnail", ""),
+            "{0}/01/{1}-100x75-q70-center.jpg".format(derivatives.DERIVATIVES_DIR, digest)
+        )
+        # uncropped renditions don't depend on the anchor
+        self.assertEqual(
+            derivatives.rendition_name(digest, "display", "top"),
+            derivatives.rendition_name(digest, "display", "left")
+        )
+
+    def test_resize(self):
+        renditions = derivatives.resize(image_data(), "center")
+        self.assertEqual(sorted(renditions), ["display", "thumbnail"])
+        sizes = dict(
+            (name, PILImage.open(BytesIO(data)).size)
+            for name, data in renditions.items()
+        )
+        self.assertEqual(sizes["thumbnail"], (100, 75))
+        self.assertEqual(sizes["display"], (400, 300))
+
+    def test_save_resets_digest(self):
+        image = self.image()
+        derivatives.generate(image)
+        digest = image.image_digest
+        self.assertEqual(len(digest), 40)
+
+        image.title = "A renamed photo"
+        image.save()
+        self.assertEqual(Image.objects.get(pk=image.pk).image_digest, digest)
+
+        image.crop_from = "top"
+        image.save()
+        self.assertEqual(Image.objects.get(pk=image.pk).image_digest, "")
+
+    def test_generate_many(self):
+        images = [self.image(), self.image(image_data((50, 50))), self.image(b"not an image")]
+        self.assertEqual(derivatives.generate_many(images, processes=1), 2)
+        for image in images[:2]:
+            digest = Image.objects.get(pk=image.pk).image_digest
+            self.assertEqual(digest, image.image_digest)
+            for name in derivatives.RENDITIONS:
+                self.assertTrue(default_storage.exists(
+                    derivatives.rendition_name(digest, name, image.crop_from)
+                ))
+        self.assertEqual(Image.objects.get(pk=images[2].pk).image_digest, "")
+
+    def test_generate_many_missing_original(self):
+        images = [self.image(), self.image()]
+        missing = images[0] = Image.objects.get(pk=images[0].pk)
+        default_storage.delete(missing.image.name)
+        self.assertEqual(derivatives.generate_many(images, processes=1), 1)
+        self.assertEqual(Image.objects.get(pk=missing.pk).image_digest, "")
+        self.assertEqual(len(Image.objects.get(pk=images[1].pk).image_digest), 40)
+
+    def test_rendition_url_after_renditions_change(self):
+        image = self.image()
+        derivatives.generate(image)
+        derivatives.RENDITIONS["thumbnail"] = (120, 90, True, 70)
+        path = derivatives.rendition_name(image.image_digest, "thumbnail", image.crop_from)
+        self.assertFalse(default_storage.exists(path))
+        self.assertEqual(derivatives.rendition_url(image, "thumbnail"), default_storage.url(path))
+        self.assertTrue(default_storage.exists(path))
+
+    def test_unreadable_original(self):
+        image = self.image(b"not an image")
+        self.assertFalse(derivatives.try_generate(image))
+        self.assertEqual(derivatives.rendition_url(image, "thumbnail"), "")
+
+
+class GroupPrefetchTest(TestCase):
+    urls = "pinax.apps.photos.tests"
+
+    def setUp(self):
+        self.user = User.objects.create_user("photographer", "photographer@example.com", "secret")
+        self.group = TestPhotoGroup.objects.create(
+            slug="test",
+            name="Test Group",
+            description="A test group.",
+            creator=self.user
+        )
+        images = [
+            Image.objects.create(
+                title="Photo {0}".format(i),
+                title_slug="photo-{0}".format(i),
+                member=self.user
+            )
+            for i in range(4)
+        ]
+        # pooled with an object that isn't a group
+        Pool.objects.create(photo=images[2], content_object=self.user)
+        # and in a group, after such an object
+        Pool.objects.create(photo=images[3], content_object=self.user)
+        Pool.objects.create(photo=images[3], content_object=self.group)
+        self.grouped = images[3]
+        ContentType.objects.get_for_model(User)
+        ContentType.objects.get_for_model(TestPhotoGroup)
+
+    def test_with_groups(self):
+        # one query for the images, one for their pools and one per type of
+        # group they are pooled in, however many images
+        with self.assertNumQueries(3):
+            for image in Image.objects.with_groups():
+                if image.pk == self.grouped.pk:
+                    self.assertEqual(image.group, self.group)
+                    self.assertEqual(
+                        image.get_absolute_url(),
+                        "/testphotogroup/test/photos/details/{0}/".format(image.pk)
+                    )
+                else:
+                    self.assertEqual(image.group, None)
+                    self.assertEqual(
+                        image.get_absolute_url(),
+                        "/photos/details/{0}/".format(image.pk)
+                    )
+                    self.assertTrue(image.is_allowed(self.user, "photos.view_image"))
+
+    def test_without_groups(self):
+        # the pools of each image, and each object they are pooled with
+        with self.assertNumQueries(8):
+            for image in Image.objects.all():
+                image.group
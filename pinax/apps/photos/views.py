@@ -12,6 +12,7 @@ from django.contrib import messages
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 
+from pinax.apps.photos import derivatives
 from pinax.apps.photos.models import Image, Pool
 from pinax.apps.photos.forms import PhotoUploadForm, PhotoEditForm
 
@@ -76,6 +77,10 @@ def upload(request, form_class=PhotoUploadForm, template_name="photos/upload.htm
                     group.associate(pool, gfk_field="content_object")
                     pool.save()
 
+                # when this fails, the renditions are tried again the first
+                # time the photo is shown
+                derivatives.try_generate(photo)
+
                 messages.add_message(
                     request, messages.SUCCESS,
                     ugettext("Successfully uploaded photo '%s'") % photo.title
@@ -127,7 +132,7 @@ def yourphotos(request, template_name="photos/yourphotos.html"):
     else:
         photos = photos.filter(pool__object_id=None)
 
-    photos = photos.order_by("-date_added")
+    photos = photos.order_by("-date_added").with_groups()
 
     ctx = group_context(group, bridge)
     ctx.update({
@@ -155,7 +160,7 @@ def photos(request, template_name="photos/latest.html"):
     else:
         photos = photos.filter(pool__object_id=None)
 
-    photos = photos.order_by("-date_added")
+    photos = photos.order_by("-date_added").with_groups()
 
     ctx = group_context(group, bridge)
     ctx.update({
@@ -224,7 +229,7 @@ def memberphotos(request, username, template_name="photos/memberphotos.html"):
     else:
         photos = photos.filter(pool__object_id=None)
 
-    photos = photos.order_by("-date_added")
+    photos = photos.order_by("-date_added").with_groups()
 
     ctx = group_context(group, bridge)
     ctx.update({
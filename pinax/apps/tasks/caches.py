@@ -0,0 +1,21 @@
+from cache_tagging.django_cache_tagging import registry
+from .models import Task, TaskHistory
+
+
+def task_invalidator(*a, **kw):
+    """Returns tags for cache invalidation"""
+    obj = kw['instance']
+    tags = []
+    tags.append(obj.list_cache_tag)
+    return tags
+
+def task_history_invalidator(*a, **kw):
+    """Returns tags for cache invalidation"""
+    return ['tasks.feeds']
+
+caches = [
+    (Task, task_invalidator, ),
+    (TaskHistory, task_history_invalidator, ),
+]
+
+registry.register(caches)
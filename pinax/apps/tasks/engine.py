@@ -0,0 +1,93 @@
+from __future__ import absolute_import, unicode_literals
+# -*- coding: utf-8 -*-
+"""
+A compiled view of the workflow's STATE_TRANSITIONS.
+
+The transitions are indexed by source state once, at import, and permission
+functions are memoized while checking so each one runs at most once per
+(task, user) pair. Permissions marked with ``workflow.per_user`` only run
+once per user no matter how many tasks are checked.
+"""
+from django.conf import settings
+from django.utils.importlib import import_module
+
+try:
+    str = unicode  # Python 2.* compatible
+except NameError:
+    pass
+
+workflow = import_module(getattr(settings, "TASKS_WORKFLOW_MODULE", "pinax.apps.tasks.workflow"))
+
+
+class CompiledWorkflow(object):
+    """
+    state transitions indexed by the state they leave from.
+    """
+    
+    def __init__(self, transitions):
+        self.transitions = {}
+        for transition in transitions:
+            self.transitions.setdefault(str(transition[0]), []).append((
+                str(transition[1]), # new state
+                transition[2], # permission
+                transition[3], # description
+            ))
+    
+    def check(self, permission, task, user, cache):
+        """
+        run a permission (or each operand of an OR) through the cache.
+        """
+        
+        operands = getattr(permission, "predicates", None)
+        if operands is not None:
+            for operand in operands:
+                if self.check(operand, task, user, cache):
+                    return True
+            return False
+        
+        if getattr(permission, "per_user", False):
+            key = (permission, None)
+        else:
+            # not id(task): a task freed during a batch could lend its id
+            # to another one
+            key = (permission, task.pk)
+        try:
+            return cache[key]
+        except KeyError:
+            result = cache[key] = bool(permission(task, user))
+            return result
+    
+    def allowable_states(self, task, user, cache=None):
+        """
+        return state choices allowed given current state and user
+        """
+        
+        if cache is None:
+            cache = {}
+        
+        choices = []
+        for new_state, permission, description in self.transitions.get(str(task.state), ()):
+            if self.check(permission, task, user, cache):
+                choices.append((new_state, description))
+        return choices
+    
+    def allowable_states_for(self, tasks, user):
+        """
+        return a dictionary mapping each task's pk to its allowed state
+        choices for the given user.
+        """
+        
+        # one cache for the whole batch so per-user permissions (such as the
+        # task manager group lookup) are only resolved once
+        cache = {}
+        return dict(
+            (task.pk, self.allowable_states(task, user, cache))
+            for task in tasks
+        )
+
+
+compiled_workflow = CompiledWorkflow(workflow.STATE_TRANSITIONS)
+
+
+def allowable_states_for(tasks, user):
+    return compiled_workflow.allowable_states_for(tasks, user)
@@ -0,0 +1,97 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Streaming exports of tasks and task history.
+
+Rows are read in primary key ordered chunks and written out as they are
+read, so memory stays flat however many rows are exported.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:
+    # older Django streams an iterator given to HttpResponse
+    StreamingHttpResponse = HttpResponse
+
+from pinax.apps.tasks.models import Task, TaskHistory
+from pinax.apps.tasks.writers import WRITERS
+from pinax.utils.workers import chunks
+
+
+
+EXPORT_CHUNK_SIZE = getattr(settings, "TASKS_EXPORT_CHUNK_SIZE", 1000)
+
+TASK_COLUMNS = [
+    ("id", lambda task: task.pk),
+    ("summary", lambda task: task.summary),
+    ("detail", lambda task: task.detail),
+    ("markup", lambda task: task.markup),
+    ("creator", lambda task: task.creator.username),
+    ("created", lambda task: task.created),
+    ("modified", lambda task: task.modified),
+    ("assignee", lambda task: task.assignee.username if task.assignee_id else None),
+    ("tags", lambda task: task.tags),
+    ("status", lambda task: task.status),
+    ("state", lambda task: task.get_state_display()),
+    ("resolution", lambda task: task.get_resolution_display()),
+    ("nudges", lambda task: task.nudge_count),
+]
+
+HISTORY_COLUMNS = [
+    ("id", lambda change: change.pk),
+    ("task", lambda change: change.task_id),
+    ("owner", lambda change: change.owner.username),
+    ("modified", lambda change: change.modified),
+    ("summary", lambda change: change.summary),
+    ("detail", lambda change: change.detail),
+    ("assignee", lambda change: change.assignee.username if change.assignee_id else None),
+    ("tags", lambda change: change.tags),
+    ("status", lambda change: change.status),
+    ("state", lambda change: change.get_state_display()),
+    ("resolution", lambda change: change.get_resolution_display()),
+    ("comment", lambda change: change.comment),
+]
+
+
+
+def task_rows(queryset):
+    queryset = queryset.select_related("creator", "assignee")
+    for chunk in chunks(queryset, EXPORT_CHUNK_SIZE):
+        for task in chunk:
+            yield [column(task) for name, column in TASK_COLUMNS]
+
+
+def history_rows(queryset):
+    queryset = queryset.select_related("owner", "assignee")
+    for chunk in chunks(queryset, EXPORT_CHUNK_SIZE):
+        # compact rows are rebuilt one chunk at a time
+        for change in TaskHistory.objects.reconstruct(chunk):
+            yield [column(change) for name, column in HISTORY_COLUMNS]
+
+
+def group_queryset(model, group):
+    if group:
+        return group.content_objects(model)
+    return model.objects.filter(object_id=None)
+
+
+def export_lines(model, group, format="csv"):
+    """
+    yield the lines of an export of model (Task or TaskHistory) in group.
+    """
+    
+    writer = WRITERS[format][0]
+    queryset = group_queryset(model, group)
+    if model is TaskHistory:
+        return writer([name for name, column in HISTORY_COLUMNS], history_rows(queryset))
+    return writer([name for name, column in TASK_COLUMNS], task_rows(queryset))
+
+
+def export_response(model, group, format, filename):
+    response = StreamingHttpResponse(
+        export_lines(model, group, format),
+        content_type = WRITERS[format][1]
+    )
+    response["Content-Disposition"] = "attachment; filename={0}.{1}".format(filename, format)
+    return response
@@ -0,0 +1,67 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Notification fan-out for task events.
+
+Each event is queued as a single job. A worker resolves the audience (the
+group's members, or every user outside of a group) in chunks of primary keys
+and hands each chunk to notification.send, so the request never waits on the
+size of the audience.
+
+Jobs only read the audience; everything about the event is passed to them by
+value. send is called once the change is committed (bulk_transition sends
+tasks_transitioned after its transaction), so a rolled back change is never
+announced. Queued jobs live in memory only and are lost if the process exits
+before they run.
+"""
+from django.conf import settings
+
+from django.contrib.auth.models import User
+
+if "notification" in settings.INSTALLED_APPS:
+    from notification import models as notification
+else:
+    notification = None
+
+from pinax.utils.workers import WorkerPool, chunks
+
+
+
+NOTIFICATION_WORKERS = getattr(settings, "TASKS_NOTIFICATION_WORKERS", 2)
+NOTIFICATION_CHUNK_SIZE = getattr(settings, "TASKS_NOTIFICATION_CHUNK_SIZE", 500)
+
+pool = WorkerPool(NOTIFICATION_WORKERS)
+
+
+
+def audience(group, exclude_id=None, chunk_size=None):
+    """
+    iterate over lists of users to notify about an event in group, reading
+    the members in primary key order one chunk at a time.
+    """
+    
+    if chunk_size is None:
+        chunk_size = NOTIFICATION_CHUNK_SIZE
+    
+    if group:
+        users = group.member_queryset()
+    else:
+        users = User.objects.all() # @@@
+    if exclude_id is not None:
+        users = users.exclude(id__exact=exclude_id)
+    return chunks(users, chunk_size)
+
+
+def deliver(group, exclude_id, label, extra_context):
+    for users in audience(group, exclude_id):
+        notification.send(users, label, extra_context)
+
+
+def send(group, sender, label, extra_context):
+    """
+    queue a notice about a task event for everyone in group but sender.
+    """
+    
+    if notification is None:
+        return
+    exclude_id = sender.pk if sender is not None else None
+    pool.submit(deliver, group, exclude_id, label, extra_context)
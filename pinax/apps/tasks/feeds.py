@@ -1,15 +1,12 @@
 from __future__ import absolute_import, unicode_literals
-from datetime import datetime
-
 from atomformat import Feed
 
 from django.core.urlresolvers import reverse
 from django.conf import settings
 from django.template.defaultfilters import linebreaks, escape
 
-from django.contrib.sites.models import Site
-
 from pinax.apps.tasks.models import TaskHistory
+from pinax.utils.feeds import CachedFeed
 
 
 
@@ -17,11 +14,14 @@ ITEMS_PER_FEED = getattr(settings, "PINAX_ITEMS_PER_FEED", 20)
 
 
 
-class BaseTaskFeed(Feed):
+class BaseTaskFeed(CachedFeed, Feed):
+    
+    updated_field = "modified"
+    cache_tags = ["tasks.feeds"]
     
     def item_id(self, item):
         return "http://{0}{1}".format(
-            Site.objects.get_current().domain,
+            self.domain,
             item.task.get_absolute_url(),
         )
     
@@ -50,29 +50,26 @@ class BaseTaskFeed(Feed):
         return [{"name" : item.owner.username}]
     
     def feed_id(self):
-        return "http://{0}/tasks/feeds/all/".format(Site.objects.get_current().domain)
+        return "http://{0}/tasks/feeds/all/".format(self.domain)
     
     def feed_title(self):
         return "Tasks Changes"
     
     def feed_updated(self):
-        qs = self.get_qs()
-        # We return an arbitrary date if there are no results, because there
-        # must be a feed_updated field as per the Atom specifications, however
-        # there is no real data to go by, and an arbitrary date can be static.
-        if qs.count() == 0:
-            return datetime(year=2008, month=7, day=1)
-        return qs.latest("modified").modified
+        return self.last_modified()
     
     def feed_links(self):
         complete_url = "http://{0}{1}".format(
-            Site.objects.get_current().domain,
+            self.domain,
             reverse("task_list"),
         )
         return ({"href": complete_url},)
     
     def items(self):
-        return self.get_qs()[:ITEMS_PER_FEED]
+        return TaskHistory.objects.reconstruct(self.get_qs()[:ITEMS_PER_FEED])
+    
+    def state_queryset(self, obj=None):
+        return self.get_qs()
     
     def get_qs(self):
         return TaskHistory.objects.filter(object_id__isnull=True).order_by("-modified")
@@ -4,6 +4,8 @@ from django.db import models
 
 from django_markup.markup import formatter
 
+from pinax.utils.fields import KeptOnSaveMixin
+
 MARKUP_DEFAULT_FILTER = getattr(settings, "MARKUP_DEFAULT_FILTER", None)
 MARKUP_CHOICES = getattr(settings, "MARKUP_CHOICES", [])
 
@@ -25,3 +27,12 @@ class MarkupField(models.CharField):
         if self.markup_default_filter:
             return None
         return super(MarkupField, self).formfield(**kwargs)
+
+
+
+class CounterField(KeptOnSaveMixin, models.PositiveIntegerField):
+    pass
+
+
+class KeptDateTimeField(KeptOnSaveMixin, models.DateTimeField):
+    pass
@@ -10,6 +10,7 @@ from django.utils.translation import ugettext
 from django.contrib.auth.models import User
 
 from pinax.apps.tasks.models import Task, TaskHistory, workflow
+from pinax.apps.tasks.permissions import same_user
 from pinax.apps.tasks.widgets import ReadOnlyWidget
 
 from pinax.apps.tagging_utils.widgets import TagAutoCompleteInput
@@ -95,7 +96,7 @@ class EditTaskForm(forms.ModelForm):
         if not workflow.is_task_manager(self.instance, user):
             del self.fields["detail"]
         
-        if self.instance.assignee != user:
+        if not same_user(self.instance.assignee_id, user):
             del self.fields["status"]
         
         self.fields["state"].choices = self.instance.allowable_states(user)
@@ -0,0 +1,146 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Keyset (seek) pagination for task lists.
+
+Lists are ordered by (state, -modified, -id) and a page starts after the
+cursor of the last task on the previous page, so every page costs the same no
+matter how deep it is. The ids making up a page are cached per group and per
+filter; the cache is invalidated whenever a task of that group changes.
+"""
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import simplejson
+
+from django.contrib.contenttypes.models import ContentType
+
+from cache_tagging.django_cache_tagging import cache
+
+from pinax.apps.tasks.models import Task, task_list_cache_tag
+
+
+
+TASKS_PAGE_SIZE = getattr(settings, "TASKS_PAGE_SIZE", 100)
+TASKS_LIST_CACHE_TIMEOUT = getattr(settings, "TASKS_LIST_CACHE_TIMEOUT", 600)
+
+CURSOR_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+ORDERING = ("state", "-modified", "-id")
+
+
+
+def encode_cursor(state, modified, pk):
+    return "{0},{1},{2}".format(state, modified.strftime(CURSOR_FORMAT), pk)
+
+
+def decode_cursor(cursor):
+    try:
+        state, modified, pk = cursor.split(",")
+        return state, datetime.strptime(modified, CURSOR_FORMAT), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def group_cache_tag(group):
+    if group is None:
+        return task_list_cache_tag(None, None)
+    return task_list_cache_tag(ContentType.objects.get_for_model(group).pk, group.pk)
+
+
+class KeysetPage(object):
+    """
+    one page of a task list: the ids it holds and the cursor of the next page.
+    """
+    
+    def __init__(self, ids, next_cursor, param):
+        self.ids = ids
+        self.next_cursor = next_cursor
+        self.param = param
+    
+    @property
+    def tasks(self):
+        # still a queryset so templates can {% order %} and filter it
+        return Task.objects.filter(pk__in=self.ids).select_related("assignee")
+    
+    def next_querystring(self, querydict):
+        if self.next_cursor is None:
+            return None
+        querydict = querydict.copy()
+        querydict[self.param] = self.next_cursor
+        querydict.pop("format", None)
+        return querydict.urlencode()
+
+
+def keyset_page(queryset, request, group, param="after", limit=None):
+    """
+    return the KeysetPage of queryset that follows the cursor given in the
+    request's ``param`` GET parameter.
+    """
+    
+    if limit is None:
+        limit = TASKS_PAGE_SIZE
+    
+    querydict = request.GET.copy()
+    querydict.pop("format", None)
+    cache_key = "tasks.list:{0}:{1}".format(param, hashlib.md5(
+        "{0}?{1}".format(request.path, querydict.urlencode()).encode("utf-8")
+    ).hexdigest())
+    
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return KeysetPage(cached[0], cached[1], param)
+    
+    queryset = queryset.order_by(*ORDERING)
+    after = decode_cursor(request.GET.get(param))
+    if after is not None:
+        state, modified, pk = after
+        queryset = queryset.filter(
+            Q(state__gt=state) |
+            Q(state=state, modified__lt=modified) |
+            Q(state=state, modified=modified, id__lt=pk)
+        )
+    
+    rows = list(queryset.values_list("id", "state", "modified")[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        pk, state, modified = rows[-1]
+        next_cursor = encode_cursor(state, modified, pk)
+    ids = [row[0] for row in rows]
+    
+    cache.set(cache_key, (ids, next_cursor),
+        tags = [group_cache_tag(group)],
+        timeout = TASKS_LIST_CACHE_TIMEOUT
+    )
+    return KeysetPage(ids, next_cursor, param)
+
+
+def task_json(task, group):
+    return {
+        "id": task.id,
+        "summary": task.summary,
+        "state": task.state,
+        "state_display": task.get_state_display(),
+        "modified": task.modified.strftime(CURSOR_FORMAT),
+        "assignee": task.assignee.username if task.assignee_id else None,
+        "tags": task.tags,
+        "status": task.status,
+        "url": task.get_absolute_url(group),
+    }
+
+
+def json_response(pages, group):
+    """
+    serialize a dictionary of name -> KeysetPage in list order.
+    """
+    
+    data = {}
+    for name, page in pages.items():
+        tasks = dict((task.pk, task) for task in page.tasks)
+        data[name] = {
+            "tasks": [task_json(tasks[pk], group) for pk in page.ids if pk in tasks],
+            "next": page.next_cursor,
+        }
+    return HttpResponse(simplejson.dumps(data), mimetype="application/json")
@@ -14,6 +14,7 @@ try:
         notification.create_notice_type("tasks_new", _("New Task"), _("a new task been created"), default=2)
         notification.create_notice_type("tasks_comment", _("Task Comment"), _("a new comment has been made on a task"), default=2)
         notification.create_notice_type("tasks_change", _("Task State Change"), _("there has been a change in the state of a task"), default=2)
+        notification.create_notice_type("tasks_bulk_change", _("Task Bulk State Change"), _("several tasks have changed state at once"), default=2)
         notification.create_notice_type("tasks_assignment", _("Task Assignment"), _("a task has been (re)assigned"), default=2)
         notification.create_notice_type("tasks_status", _("Task Status Update"), _("there has been a status update to a task"), default=2)
         notification.create_notice_type("tasks_tags", _("Task Tag Update"), _("there has been a change in the tagging of a task"), default=2)
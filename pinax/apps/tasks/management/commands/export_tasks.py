@@ -0,0 +1,59 @@
+from __future__ import absolute_import, unicode_literals
+import optparse
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import get_model
+
+from pinax.apps.tasks.export import export_lines
+from pinax.apps.tasks.models import Task, TaskHistory
+from pinax.apps.tasks.writers import WRITERS
+
+
+
+class Command(BaseCommand):
+    
+    help = "Writes the tasks (or task history) of a group to stdout as CSV or JSON"
+    
+    option_list = BaseCommand.option_list + (
+        optparse.make_option("--history",
+            dest = "history",
+            action = "store_true",
+            help = "export the task history instead of the tasks"
+        ),
+        optparse.make_option("--format",
+            dest = "format",
+            default = "csv",
+            help = "csv (default) or json"
+        ),
+        optparse.make_option("--group-type",
+            dest = "group_type",
+            help = "app_label.model of the group the tasks belong to"
+        ),
+        optparse.make_option("--group-id",
+            dest = "group_id",
+            help = "primary key of the group the tasks belong to"
+        ),
+    )
+    
+    def handle(self, *args, **options):
+        format = options["format"]
+        if format not in WRITERS:
+            raise CommandError("unknown format {0!r}".format(format))
+        
+        group = None
+        if options["group_type"]:
+            try:
+                app_label, model_name = options["group_type"].split(".")
+            except ValueError:
+                raise CommandError("--group-type must be given as app_label.model")
+            model = get_model(app_label, model_name)
+            if model is None:
+                raise CommandError("unknown group type {0!r}".format(options["group_type"]))
+            try:
+                group = model._default_manager.get(pk=options["group_id"])
+            except model.DoesNotExist:
+                raise CommandError("no {0} with id {1!r}".format(options["group_type"], options["group_id"]))
+        
+        model = TaskHistory if options["history"] else Task
+        for line in export_lines(model, group, format):
+            self.stdout.write(line)
@@ -0,0 +1,20 @@
+from __future__ import absolute_import, unicode_literals
+from pinax.apps.tasks import permissions
+
+
+
+class TaskPermissionMiddleware(object):
+    """
+    Keeps the group memberships used by the tasks workflow for the length of
+    a request so detail and list pages look them up once per user.
+    """
+    
+    def process_request(self, request):
+        permissions.begin()
+    
+    def process_response(self, request, response):
+        permissions.end()
+        return response
+    
+    def process_exception(self, request, exception):
+        permissions.end()
@@ -1,8 +1,11 @@
 from __future__ import absolute_import, unicode_literals
 # -*- coding: utf-8 -*-
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, Q
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.core.urlresolvers import reverse
@@ -14,16 +17,15 @@ from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 
-if "notification" in settings.INSTALLED_APPS:
-    from notification import models as notification
-else:
-    notification = None
-
+from cache_tagging.django_cache_tagging import cache
 from tagging.fields import TagField
 from tagging.models import Tag
 from threadedcomments.models import ThreadedComment
 
-from pinax.apps.tasks.fields import MarkupField
+from pinax.apps.tasks import fanout
+from pinax.apps.tasks.engine import compiled_workflow
+from pinax.apps.tasks.fields import CounterField, KeptDateTimeField, MarkupField
+from pinax.apps.tasks.signals import tasks_transitioned
 
 try:
     str = unicode  # Python 2.* compatible
@@ -32,6 +34,75 @@ except NameError:
 
 workflow = import_module(getattr(settings, "TASKS_WORKFLOW_MODULE", "pinax.apps.tasks.workflow"))
 
+# compact history only stores the text fields that changed since the previous
+# row, writing a full keyframe every HISTORY_KEYFRAME_INTERVAL changes
+COMPACT_HISTORY = getattr(settings, "TASKS_COMPACT_HISTORY", False)
+HISTORY_KEYFRAME_INTERVAL = getattr(settings, "TASKS_HISTORY_KEYFRAME_INTERVAL", 20)
+
+# history_snapshot's previous when the caller did not look it up; None means
+# the task has no history yet
+NOT_FETCHED = object()
+
+
+def task_list_cache_tag(content_type_id, object_id):
+    """
+    cache tag shared by every cached task list of a group.
+    """
+    
+    return "tasks.task.group:{0}.{1}".format(content_type_id, object_id)
+
+
+def invalidate_task_lists(tasks):
+    # for changes made with QuerySet.update(), which sends no post_save
+    cache.invalidate_tags(*set(task.list_cache_tag for task in tasks))
+
+
+class TaskManager(models.Manager):
+    
+    def bulk_transition(self, tasks, new_state, user):
+        """
+        move every task to new_state with a single UPDATE and record the
+        history of the whole batch at once. tasks_transitioned is sent once
+        for the batch rather than once per task, after the transaction is
+        committed, so the notices it queues never describe a rolled back
+        change.
+        """
+        
+        tasks = list(tasks)
+        if not tasks:
+            return tasks
+        
+        new_state = str(new_state)
+        self._transition(tasks, new_state, user)
+        tasks_transitioned.send(sender=Task, tasks=tasks, new_state=new_state, user=user)
+        return tasks
+    
+    @transaction.commit_on_success
+    def _transition(self, tasks, new_state, user):
+        now = datetime.now()
+        
+        self.filter(pk__in=[task.pk for task in tasks]).update(
+            state = new_state,
+            modified = now
+        )
+        
+        if COMPACT_HISTORY:
+            previous = TaskHistory.objects.latest_for(tasks)
+        else:
+            previous = {}
+        
+        history = []
+        for task in tasks:
+            task.state = new_state
+            task.modified = now
+            th = task.history_snapshot(change_owner=user, previous=previous.get(task.pk))
+            th.modified = now
+            history.append(th)
+        
+        TaskHistory.objects.bulk_create(history)
+        
+        invalidate_task_lists(tasks)
+
 
 class Task(models.Model):
     """
@@ -80,6 +151,13 @@ class Task(models.Model):
         blank = True
     )
     
+    # denormalized from Nudge; kept up to date by nudge_added and
+    # nudge_removed, and left out of the updates of Task.save
+    nudge_count = CounterField(_("nudges"), default=0, editable=False)
+    last_nudged = KeptDateTimeField(_("last nudged"), null=True, blank=True, editable=False)
+    
+    objects = TaskManager()
+    
     # fields for review and saves
     fields = [
         "summary",
@@ -101,28 +179,67 @@ class Task(models.Model):
         self.modified = datetime.now()
         super(Task, self).save(**kwargs)
     
+    def refresh_nudges(self):
+        for nudge_count, last_nudged in Task.objects.filter(pk=self.pk).values_list("nudge_count", "last_nudged"):
+            self.nudge_count = nudge_count
+            self.last_nudged = last_nudged
+    
+    @property
+    def list_cache_tag(self):
+        return task_list_cache_tag(self.content_type_id, self.object_id)
+    
     def get_absolute_url(self, group=None):
         kwargs = {"id": self.pk}
         if group:
             return group.content_bridge.reverse("task_detail", group, kwargs)
         return reverse("task_detail", kwargs=kwargs)
     
+    @transaction.commit_on_success
+    def toggle_nudge(self, user):
+        """
+        add the user's nudge to this task or take it back if there already is
+        one. returns True when the task is now nudged by the user.
+        """
+        
+        nudged = list(Nudge.objects.filter(task__exact=self, nudger__exact=user))
+        if nudged:
+            with counting_nudges(self):
+                Nudge.objects.filter(pk__in=[nudge.pk for nudge in nudged]).delete()
+            Task.objects.filter(pk=self.pk).update(
+                nudge_count = F("nudge_count") - len(nudged),
+                last_nudged = Nudge.objects.filter(task=self).aggregate(last=Max("modified"))["last"]
+            )
+        else:
+            Nudge.objects.create(nudger=user, task=self)
+        self.refresh_nudges()
+        invalidate_task_lists([self])
+        return not nudged
+    
+    @transaction.commit_on_success
     def denudge(self):
         # we remove all nudges for this Task
-        for nudge in Nudge.objects.filter(task__exact=self):
-            nudge.delete()
+        with counting_nudges(self):
+            Nudge.objects.filter(task__exact=self).delete()
+        Task.objects.filter(pk=self.pk).update(nudge_count=0, last_nudged=None)
+        self.nudge_count = 0
+        self.last_nudged = None
+        invalidate_task_lists([self])
     
-    def save_history(self, comment_instance=None, change_owner=None):
+    def history_snapshot(self, comment_instance=None, change_owner=None, previous=NOT_FETCHED):
         """
-        Create a new ChangeSet with the old content.
+        Build an unsaved TaskHistory holding the current content. With
+        COMPACT_HISTORY it is reduced to a delta against ``previous``, the
+        latest reconstructed history row of this task (None when there is
+        none), which is looked up unless given.
         """
         
         # get the task history object
         th = TaskHistory()
         th.task = self
         
-        if self.group:
-            self.group.associate(th, commit=False)
+        # same as group.associate(th, commit=False) without loading the group
+        th.content_type_id = self.content_type_id
+        th.object_id = self.object_id
         
         # save the simple fields
         
@@ -137,73 +254,161 @@ class Task(models.Model):
         else:
             # This record is being created right now, hence the assignment
             # of the creator to the task history object's owner field.
-            th.owner = self.creator
+            th.owner_id = self.creator_id
         
         # handle the comments
         if comment_instance:
             th.comment = comment_instance.comment
         
+        if COMPACT_HISTORY:
+            if previous is NOT_FETCHED:
+                previous = TaskHistory.objects.latest_for([self]).get(self.pk)
+            th.compact(previous)
+        
+        return th
+    
+    def save_history(self, comment_instance=None, change_owner=None):
+        """
+        Create a new ChangeSet with the old content.
+        """
+        
+        th = self.history_snapshot(comment_instance, change_owner)
         th.save()
+        return th
     
     def allowable_states(self, user):
         """
         return state choices allowed given current state and user
         """
         
-        # I'm the relevant state choices.
-        choices = []
-        
-        # I'm the states already allowed for the users
-        existing_states = []
-        
-        for transition in workflow.STATE_TRANSITIONS:
-            
-            if self.state != str(transition[0]):
-                # if the current state does not match a first element in the
-                # state transitions we skip to the next transition
-                continue
-            
-            # Fire the validation function.
-            if transition[2](self, user):
-                
-                # grab the new state and state description
-                new_state = str(transition[1])
-                description = transition[3]
-                
-                # build new element
-                element = (new_state, description)
-                
-                # append new element to choices
-                choices.append(element)
-        
-        return choices
+        return compiled_workflow.allowable_states(self, user)
 
 
 def new_comment(sender, instance, **kwargs):
     if isinstance(instance.content_object, Task):
         task = instance.content_object
-        task.save()
+        # only the modification time changes, so skip a full save
+        task.modified = datetime.now()
+        Task.objects.filter(pk=task.pk).update(modified=task.modified)
+        invalidate_task_lists([task])
         # pass in the instance.user so that the task history owner is recorded
         # as the commenter
         task.save_history(comment_instance=instance,change_owner=instance.user)
         group = task.group
-        if notification:
-            if group:
-                notify_list = group.member_queryset().exclude(id__exact=instance.user.id) # @@@
-            else:
-                notify_list = User.objects.all().exclude(id__exact=instance.user.id)
-            notification.send(notify_list, "tasks_comment", {
-                "user": instance.user, "task": task, "comment": instance, "group": group,
-            })
+        fanout.send(group, instance.user, "tasks_comment", {
+            "user": instance.user, "task": task, "comment": instance, "group": group,
+        })
 models.signals.post_save.connect(new_comment, sender=ThreadedComment)
 
 
+def bulk_state_change(sender, tasks, new_state, user, **kwargs):
+    # one notice per group in the batch instead of one per task
+    batches = {}
+    for task in tasks:
+        batches.setdefault((task.content_type_id, task.object_id), []).append(task)
+    new_state_display = dict(workflow.STATE_CHOICES).get(new_state, new_state)
+    for batch in batches.values():
+        group = batch[0].group
+        fanout.send(group, user, "tasks_bulk_change", {
+            "user": user, "tasks": batch, "group": group, "new_state": new_state_display,
+        })
+tasks_transitioned.connect(bulk_state_change, sender=Task)
+
+
+class HistorySnapshots(object):
+    """
+    Wraps a TaskHistory queryset and reconstructs compact rows as they are
+    sliced, so a paginated page only rebuilds the rows it shows.
+    """
+    
+    def __init__(self, queryset):
+        self.queryset = queryset
+    
+    def count(self):
+        return self.queryset.count()
+    
+    def __len__(self):
+        return self.count()
+    
+    def __iter__(self):
+        return iter(TaskHistory.objects.reconstruct(self.queryset))
+    
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return TaskHistory.objects.reconstruct(self.queryset[k])
+        return TaskHistory.objects.reconstruct([self.queryset[k]])[0]
+
+
+class TaskHistoryManager(models.Manager):
+    
+    def reconstruct(self, rows):
+        """
+        Fill in the fields a compact row omitted from its keyframe and the
+        deltas in between. Works on rows of any number of tasks with a single
+        query; keyframes are returned untouched.
+        """
+        
+        rows = list(rows)
+        keyframe_ids = set(row.keyframe_id for row in rows if row.keyframe_id)
+        
+        snapshots = {}
+        if keyframe_ids:
+            chain = self.filter(
+                Q(id__in=keyframe_ids) | Q(keyframe__in=keyframe_ids),
+                id__lte = max(row.id for row in rows)
+            ).order_by("id").values("id", "keyframe", "changed_fields", *TaskHistory.DELTA_FIELDS)
+            latest = {}
+            for values in chain:
+                if values["keyframe"] is None:
+                    keyframe = values["id"]
+                    content = dict((field, values[field]) for field in TaskHistory.DELTA_FIELDS)
+                    length = 0
+                else:
+                    keyframe = values["keyframe"]
+                    content, length = latest[keyframe]
+                    content = dict(content)
+                    length += 1
+                    for field in values["changed_fields"].split(","):
+                        if field:
+                            content[field] = values[field]
+                latest[keyframe] = snapshots[values["id"]] = (content, length)
+        
+        for row in rows:
+            if row.keyframe_id is None:
+                row.chain_length = 0
+                continue
+            content, row.chain_length = snapshots[row.id]
+            for field, value in content.items():
+                setattr(row, field, value)
+        
+        return rows
+    
+    def snapshots(self, queryset):
+        return HistorySnapshots(queryset)
+    
+    def latest_for(self, tasks):
+        """
+        return a dictionary mapping task pk to its latest history row,
+        reconstructed.
+        """
+        
+        latest = self.filter(
+            task__in = [task.pk for task in tasks]
+        ).values("task").annotate(latest=Max("id"))
+        rows = self.filter(id__in=[values["latest"] for values in latest])
+        return dict((row.task_id, row) for row in self.reconstruct(rows))
+
+
 class TaskHistory(models.Model):
     
     STATE_CHOICES = workflow.STATE_CHOICES
     RESOLUTION_CHOICES = workflow.RESOLUTION_CHOICES
     REVERSE_STATE_CHOICES = workflow.REVERSE_STATE_CHOICES
     
+    # fields a compact row leaves blank when they did not change; not tags,
+    # as blanking a TagField deletes the row's tags
+    DELTA_FIELDS = ["summary", "detail", "status"]
+    
     task = models.ForeignKey(Task,
         related_name = "history_task",
         verbose_name = _("tasks")
@@ -255,12 +460,40 @@ class TaskHistory(models.Model):
         verbose_name=_("Owner")
     )
     
+    # compact rows point at the full row they are a delta against and list
+    # which of the DELTA_FIELDS they store; keyframes leave both empty
+    keyframe = models.ForeignKey("self",
+        related_name = "deltas",
+        null = True,
+        blank = True
+    )
+    changed_fields = models.CharField(max_length=100, blank=True)
+    
+    objects = TaskHistoryManager()
+    
     def __str__(self):
         return "for " + str(self.task)
     
     def save(self, **kwargs):
         self.modified = datetime.now()
         super(TaskHistory, self).save(**kwargs)
+    
+    def compact(self, previous):
+        """
+        turn this unsaved row into a delta against previous unless a new
+        keyframe is due.
+        """
+        
+        if previous is None or previous.chain_length + 1 >= HISTORY_KEYFRAME_INTERVAL:
+            return
+        self.keyframe_id = previous.keyframe_id or previous.id
+        changed = []
+        for field in self.DELTA_FIELDS:
+            if getattr(self, field) == getattr(previous, field):
+                setattr(self, field, "")
+            else:
+                changed.append(field)
+        self.changed_fields = ",".join(changed)
 
 
 class Nudge(models.Model):
@@ -275,6 +508,48 @@ class Nudge(models.Model):
     )
     modified = models.DateTimeField(_("nudge date"), default=datetime.now)
 
+
+def nudge_added(sender, instance, created, raw=False, **kwargs):
+    # fixtures come with their counters
+    if created and not raw:
+        Task.objects.filter(pk=instance.task_id).update(
+            nudge_count = F("nudge_count") + 1,
+            last_nudged = instance.modified
+        )
+models.signals.post_save.connect(nudge_added, sender=Nudge)
+
+
+_counted = threading.local()
+
+
+@contextmanager
+def counting_nudges(task):
+    """
+    while open, deleting nudges of task leaves its counters to the caller,
+    which sets them with one update instead of one per nudge.
+    """
+    
+    tasks = getattr(_counted, "tasks", frozenset())
+    _counted.tasks = tasks | set([task.pk])
+    try:
+        yield
+    finally:
+        _counted.tasks = tasks
+
+
+def nudge_removed(sender, instance, **kwargs):
+    # also sent for nudges deleted along with their task or from the admin
+    if instance.task_id in getattr(_counted, "tasks", ()):
+        return
+    last_nudged = Nudge.objects.filter(
+        task = instance.task_id
+    ).aggregate(last=Max("modified"))["last"]
+    Task.objects.filter(pk=instance.task_id, nudge_count__gt=0).update(
+        nudge_count = F("nudge_count") - 1,
+        last_nudged = last_nudged
+    )
+models.signals.post_delete.connect(nudge_removed, sender=Nudge)
+
 # Python 2.* compatible
 try:
     unicode
@@ -0,0 +1,50 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Request scoped memoization for the workflow permission functions.
+
+TaskPermissionMiddleware opens a cache at the start of each request and drops
+it at the end. While a cache is open the group names of a user are looked up
+once; outside a request every call goes to the database as before.
+"""
+import threading
+
+from django.contrib.auth.models import Group
+
+
+
+_local = threading.local()
+
+
+
+def begin():
+    _local.groups = {}
+
+
+def end():
+    _local.groups = None
+
+
+def user_group_names(user):
+    """
+    return the set of group names the user belongs to.
+    """
+    
+    cache = getattr(_local, "groups", None)
+    if cache is not None and user.id in cache:
+        return cache[user.id]
+    names = frozenset(
+        Group.objects.filter(user=user).values_list("name", flat=True)
+    )
+    if cache is not None:
+        cache[user.id] = names
+    return names
+
+
+def same_user(user_id, user):
+    """
+    compare a foreign key id with a user without loading the related row.
+    """
+    
+    if user is None:
+        return user_id is None
+    return user_id is not None and user_id == getattr(user, "id", None)
@@ -0,0 +1,5 @@
+from __future__ import absolute_import, unicode_literals
+import django.dispatch
+
+
+tasks_transitioned = django.dispatch.Signal(providing_args=["tasks", "new_state", "user"])
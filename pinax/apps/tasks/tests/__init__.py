@@ -1,5 +1,6 @@
 from __future__ import absolute_import, unicode_literals
 from .test_authentication import *
 from .test_client import *
+from .test_fanout import *
 from .test_models import *
 from .test_workflow import *
\ No newline at end of file
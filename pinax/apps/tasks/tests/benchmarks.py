@@ -0,0 +1,308 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Benchmarks for the hot paths of the tasks app.
+
+Generates 1k, 10k and 100k tasks in a SQLite database and measures the wall
+time and the number of queries of the task views, allowable_states and the
+history saved when a task is commented on. Results are written as JSON.
+Run from the root of a Pinax checkout::
+
+    python pinax/apps/tasks/tests/benchmarks.py --sizes 1000,10000 --output results.json
+
+The requests are made by a member of the task manager group who isn't a
+superuser, so the workflow permissions are checked the way they are for most
+users.
+
+No thresholds are shipped: times only mean something on the machine that
+measured them. To guard a change, record a baseline before it and check
+against it after, on the same machine::
+
+    python pinax/apps/tasks/tests/benchmarks.py --record baseline.json
+    python pinax/apps/tasks/tests/benchmarks.py --baseline baseline.json
+
+A recorded baseline allows exactly the measured number of queries and
+RECORD_HEADROOM times the measured time; the exit status is 1 when a run
+exceeds it.
+"""
+import json
+import optparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# the repository root, so tests.runner is importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 4)))
+
+from tests.runner import setup_test_environment
+
+setup_test_environment()
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection, reset_queries
+from django.test.client import Client
+from django.test.utils import setup_test_environment as setup_django_test_environment
+
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+
+from tagging.models import Tag, TaggedItem
+from threadedcomments.models import ThreadedComment
+
+from pinax.apps.tasks import workflow
+from pinax.apps.tasks.workflow import TASK_MANAGER
+from pinax.apps.tasks.models import Task, TaskHistory
+
+
+
+SIZES = [1000, 10000, 100000]
+REPEAT = 5
+USERS = 50
+TAGS = 20
+HISTORY_PER_TASK = 30
+BATCH_SIZE = 500
+
+# recorded time limits over the measured times, for timing noise
+RECORD_HEADROOM = 1.5
+
+
+
+def bulk_create(model, objects):
+    for i in range(0, len(objects), BATCH_SIZE):
+        model.objects.bulk_create(objects[i:i + BATCH_SIZE])
+
+
+def generate(size):
+    """
+    fill the database with size tasks spread over USERS users and TAGS tags.
+    the first task gets HISTORY_PER_TASK changes and a few nudges so its page
+    and history have something to show. returns the user the benchmarks run
+    as, a task manager but not a superuser, and that task.
+    """
+    
+    random.seed(size)
+    
+    bulk_create(User, [
+        User(username="user{0}".format(i), email="user{0}@example.com".format(i))
+        for i in range(USERS)
+    ])
+    users = list(User.objects.order_by("pk"))
+    # superusers skip the group lookup of is_task_manager
+    member = users[0]
+    member.set_password("test")
+    member.save()
+    member.groups.add(Group.objects.create(name=TASK_MANAGER))
+    
+    tags = ["tag{0}".format(i) for i in range(TAGS)]
+    start = datetime.now() - timedelta(days=365)
+    tasks = []
+    for i in range(size):
+        modified = start + timedelta(minutes=i)
+        tasks.append(Task(
+            summary = "task {0}".format(i),
+            detail = "detail of task {0}".format(i),
+            creator = random.choice(users),
+            assignee = random.choice(users + [None]),
+            created = modified,
+            modified = modified,
+            tags = " ".join(random.sample(tags, 2)),
+            state = random.choice(workflow.STATE_ID_LIST),
+        ))
+    bulk_create(Task, tasks)
+    
+    # bulk_create skips the TagField, so tag the tasks by hand
+    tag_ids = {}
+    for name in tags:
+        tag_ids[name] = Tag.objects.create(name=name).pk
+    task_content_type_id = ContentType.objects.get_for_model(Task).pk
+    tagged = []
+    for pk, task_tags in Task.objects.values_list("pk", "tags"):
+        for name in task_tags.split():
+            tagged.append(TaggedItem(tag_id=tag_ids[name], content_type_id=task_content_type_id, object_id=pk))
+    bulk_create(TaggedItem, tagged)
+    
+    history = []
+    for task in Task.objects.order_by("pk").iterator():
+        history.append(task.history_snapshot())
+        if len(history) >= BATCH_SIZE:
+            bulk_create(TaskHistory, history)
+            history = []
+    bulk_create(TaskHistory, history)
+    
+    task = Task.objects.order_by("pk")[0]
+    for i in range(HISTORY_PER_TASK):
+        task.status = "status {0}".format(i)
+        task.save()
+        task.save_history(change_owner=random.choice(users))
+    for user in users[:5]:
+        task.toggle_nudge(user)
+    
+    return member, task
+
+
+def measure(func, repeat=REPEAT):
+    """
+    run func repeat times and return the median wall time in milliseconds and
+    the largest number of queries of a run.
+    """
+    
+    times = []
+    queries = 0
+    for i in range(repeat):
+        # cached pages would hide the queries a cold request makes
+        cache.clear()
+        reset_queries()
+        started = time.time()
+        func()
+        times.append((time.time() - started) * 1000)
+        queries = max(queries, len(connection.queries))
+    times.sort()
+    return {"ms": round(times[len(times) // 2], 2), "queries": queries}
+
+
+def benchmarks(member, task):
+    client = Client()
+    client.login(username=member.username, password="test")
+    
+    def get(url):
+        def view():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+        return view
+    
+    def allowable_states():
+        # a fresh instance so nothing cached on the task is reused
+        Task.objects.get(pk=task.pk).allowable_states(member)
+    
+    def comment():
+        ThreadedComment.objects.create(content_object=task, user=member, comment="benchmark")
+    
+    return [
+        ("tasks", get(reverse("task_list"))),
+        ("task", get(reverse("task_detail", args=[task.pk]))),
+        ("focus", get(reverse("task_focus", args=["tag", "tag1"]))),
+        ("user_tasks", get(reverse("tasks_for_user", args=[member.username]))),
+        ("tasks_history", get(reverse("tasks_history", args=[task.pk]))),
+        ("allowable_states", allowable_states),
+        ("save_history", comment),
+    ]
+
+
+def run(size, repeat=REPEAT):
+    old_name = settings.DATABASES["default"]["NAME"]
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        member, task = generate(size)
+        return dict(
+            (name, measure(func, repeat))
+            for name, func in benchmarks(member, task)
+        )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def check(results, baseline):
+    """
+    return a list of the measurements that exceed their baseline.
+    """
+    
+    failures = []
+    for size, measurements in results.items():
+        for name, measurement in measurements.items():
+            limits = baseline.get(name, {})
+            if measurement["queries"] > limits.get("queries", float("inf")):
+                failures.append("{0} tasks: {1} made {2} queries, baseline {3}".format(
+                    size, name, measurement["queries"], limits["queries"]
+                ))
+            max_ms = limits.get("ms", {}).get(size)
+            if max_ms is not None and measurement["ms"] > max_ms:
+                failures.append("{0} tasks: {1} took {2}ms, baseline {3}ms".format(
+                    size, name, measurement["ms"], max_ms
+                ))
+    return failures
+
+
+def record(results):
+    """
+    return a baseline allowing the measured queries and RECORD_HEADROOM
+    times the measured time of each benchmark.
+    """
+    
+    baseline = {}
+    for size, measurements in results.items():
+        for name, measurement in measurements.items():
+            limits = baseline.setdefault(name, {"queries": 0, "ms": {}})
+            limits["queries"] = max(limits["queries"], measurement["queries"])
+            limits["ms"][size] = int(measurement["ms"] * RECORD_HEADROOM) + 1
+    return baseline
+
+
+def main():
+    
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--sizes",
+        dest = "sizes",
+        default = ",".join(str(size) for size in SIZES),
+        help = "comma separated numbers of tasks to generate",
+    )
+    parser.add_option("--repeat",
+        dest = "repeat",
+        default = REPEAT,
+        type = "int",
+        help = "runs of each benchmark; the median time is reported",
+    )
+    parser.add_option("--baseline",
+        dest = "baseline",
+        help = "JSON file recorded by --record to check this run against",
+    )
+    parser.add_option("--record",
+        dest = "record",
+        help = "write a baseline for later runs to this JSON file",
+    )
+    parser.add_option("--output",
+        dest = "output",
+        help = "write the results to this file instead of stdout",
+    )
+    
+    options, args = parser.parse_args()
+    
+    settings.DEBUG = True # record queries
+    settings.ROOT_URLCONF = "pinax.apps.tasks.tests.tasks_urls"
+    setup_django_test_environment()
+    
+    baseline = {}
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+    
+    results = {}
+    for size in options.sizes.split(","):
+        results[size] = run(int(size), options.repeat)
+    
+    if options.record:
+        with open(options.record, "w") as f:
+            json.dump(record(results), f, indent=2, sort_keys=True)
+            f.write("\n")
+    
+    failures = check(results, baseline)
+    output = json.dumps({
+        "results": results,
+        "baseline": baseline,
+        "failures": failures,
+    }, indent=2, sort_keys=True)
+    
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+    
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
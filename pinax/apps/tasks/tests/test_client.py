@@ -1,7 +1,14 @@
 from __future__ import absolute_import, unicode_literals
 # coding: utf-8
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.utils import simplejson
+
+from django.contrib.auth.models import User
+
+from pinax.apps.tasks import export, keyset
+from pinax.apps.tasks.models import Task
 
 
 # @@ docutils 0.6 omits the first header
@@ -65,3 +72,84 @@ class TestAddForm(TestCase):
         response = self.client.get(reverse("task_list"))
         self.assertContains(response, '<a rel="tag" href="/tasks/tag/test/">test</a>')
         
+
+
+class TestKeysetPages(TestCase):
+    fixtures = ["test_tasks.json"]
+    urls = "pinax.apps.tasks.tests.tasks_urls"
+    
+    def setUp(self):
+        self.page_size = keyset.TASKS_PAGE_SIZE
+        keyset.TASKS_PAGE_SIZE = 1
+        cache.clear()
+    
+    def tearDown(self):
+        keyset.TASKS_PAGE_SIZE = self.page_size
+        cache.clear()
+    
+    def test_json_pages(self):
+        response = self.client.get(reverse("task_list"), {"format": "json"})
+        self.failUnlessEqual(response.status_code, 200)
+        page = simplejson.loads(response.content)["tasks"]
+        self.assertEquals([task["id"] for task in page["tasks"]], [2])
+        
+        response = self.client.get(reverse("task_list"), {"format": "json", "after": page["next"]})
+        page = simplejson.loads(response.content)["tasks"]
+        self.assertEquals([task["id"] for task in page["tasks"]], [1])
+        self.assertEquals(page["next"], None)
+
+
+class TestExport(TestCase):
+    fixtures = ["test_tasks.json"]
+    urls = "pinax.apps.tasks.tests.tasks_urls"
+    
+    def setUp(self):
+        # read one row at a time to go through the chunking
+        self.chunk_size = export.EXPORT_CHUNK_SIZE
+        export.EXPORT_CHUNK_SIZE = 1
+    
+    def tearDown(self):
+        export.EXPORT_CHUNK_SIZE = self.chunk_size
+    
+    def content(self, response):
+        if getattr(response, "streaming", False):
+            return b"".join(response.streaming_content)
+        return response.content
+    
+    def test_csv(self):
+        response = self.client.get(reverse("tasks_export", args=["csv"]))
+        self.failUnlessEqual(response.status_code, 200)
+        self.assertEquals(response["Content-Type"], "text/csv")
+        lines = self.content(response).decode("utf-8").splitlines()
+        self.assertEquals(lines[0].split(",")[:2], ['"id"', '"summary"'])
+        self.assertEquals([line.split(",")[0] for line in lines[1:]], ['"1"', '"2"'])
+    
+    def test_json(self):
+        response = self.client.get(reverse("tasks_export", args=["json"]))
+        tasks = simplejson.loads(self.content(response))
+        self.assertEquals([task["id"] for task in tasks], [1, 2])
+        
+        response = self.client.get(reverse("tasks_export_history", args=["json"]))
+        self.failUnlessEqual(response.status_code, 200)
+        simplejson.loads(self.content(response))
+
+
+class TestFeed(TestCase):
+    fixtures = ["test_tasks.json"]
+    urls = "pinax.apps.tasks.tests.tasks_urls"
+    
+    def test_conditional_get(self):
+        url = "/tasks/feeds/all/"
+        response = self.client.get(url)
+        self.failUnlessEqual(response.status_code, 200)
+        etag = response["ETag"]
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.failUnlessEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.failUnlessEqual(response.status_code, 304)
+        
+        Task.objects.get(pk=1).save_history(change_owner=User.objects.all()[0])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.failUnlessEqual(response.status_code, 200)
+        self.assertNotEquals(response["ETag"], etag)
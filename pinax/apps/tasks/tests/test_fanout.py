@@ -0,0 +1,91 @@
+from __future__ import absolute_import, unicode_literals
+# coding: utf-8
+import threading
+
+from django.test import TestCase
+
+from django.contrib.auth.models import User
+
+from pinax.apps.tasks import fanout
+from pinax.utils.workers import WorkerPool
+
+
+class Notices(object):
+    """
+    records what fanout sends instead of sending it.
+    """
+    
+    def __init__(self):
+        self.sent = []
+    
+    def send(self, users, label, extra_context):
+        self.sent.append((label, [user.username for user in users]))
+
+
+class TestFanout(TestCase):
+    fixtures = ["test_tasks.json"]
+    
+    def setUp(self):
+        self.admin = User.objects.get(username__exact="admin")
+        self.notification = fanout.notification
+        fanout.notification = self.notices = Notices()
+    
+    def tearDown(self):
+        fanout.notification = self.notification
+    
+    def test_audience_chunks(self):
+        """
+        everyone but the sender, in primary key order, chunk_size at a time
+        """
+        
+        chunks = list(fanout.audience(None, self.admin.pk, chunk_size=1))
+        self.assertEquals([[user.username for user in chunk] for chunk in chunks],
+            [["joe"], ["sam"]])
+        
+        chunks = list(fanout.audience(None, chunk_size=2))
+        self.assertEquals([[user.username for user in chunk] for chunk in chunks],
+            [["admin", "joe"], ["sam"]])
+    
+    def test_send(self):
+        """
+        TASKS_NOTIFICATION_WORKERS is 0 in the tests, so send delivers inline
+        """
+        
+        self.assertEquals(fanout.pool.size, 0)
+        fanout.send(None, self.admin, "tasks_new", {})
+        self.assertEquals(self.notices.sent, [("tasks_new", ["joe", "sam"])])
+
+
+class TestWorkerPool(TestCase):
+    
+    def test_inline(self):
+        """
+        a pool of size 0 runs jobs in the calling thread
+        """
+        
+        threads = []
+        WorkerPool(0).submit(lambda: threads.append(threading.current_thread()))
+        self.assertEquals(threads, [threading.current_thread()])
+    
+    def test_workers(self):
+        """
+        jobs run on the worker threads, and a failing job doesn't stop them
+        """
+        
+        pool = WorkerPool(2)
+        done = []
+        lock = threading.Lock()
+        
+        def job(i):
+            if i == 3:
+                raise ValueError(i)
+            with lock:
+                done.append((i, threading.current_thread()))
+        
+        for i in range(10):
+            pool.submit(job, i)
+        pool.join()
+        
+        self.assertEquals(sorted(i for i, thread in done), [0, 1, 2, 4, 5, 6, 7, 8, 9])
+        self.assertFalse(threading.current_thread() in [thread for i, thread in done])
+        self.assertEquals(len(pool.threads), 2)
@@ -4,7 +4,11 @@ from django.test import TestCase
 
 from django.contrib.auth.models import User
 
+from tagging.models import Tag
+
+from pinax.apps.tasks import models
 from pinax.apps.tasks.models import Task, TaskHistory, Nudge
+from pinax.apps.tasks.timeline import task_timeline
 
 
 
@@ -75,6 +79,58 @@ class TestTask(TestCase):
         
         # The other task should have its original number of nudges
         self.assertEquals(len(self.other_task.task_nudge.all()), self.other_task_nudge_count)
+        
+        # and the counters agree
+        self.assertEquals(Task.objects.get(pk=self.task.pk).nudge_count, 0)
+        self.assertEquals(Task.objects.get(pk=self.task.pk).last_nudged, None)
+        self.assertEquals(Task.objects.get(pk=self.other_task.pk).nudge_count, self.other_task_nudge_count)
+    
+    def test_denudge_queries(self):
+        """
+        the counters are reset with one update, not recounted per nudge
+        """
+        
+        for i in range(3):
+            Nudge.objects.create(nudger=self.user_joe, task=self.task)
+        # the nudges to delete, their deletion and the counters
+        with self.assertNumQueries(3):
+            self.task.denudge()
+        self.assertEquals(Task.objects.get(pk=self.task.pk).nudge_count, 0)
+    
+    def test_toggle_nudge(self):
+        """
+        nudging twice takes the nudge back and the counter follows along
+        """
+        
+        self.assertEquals(self.other_task.toggle_nudge(self.user_joe), True)
+        self.assertEquals(Task.objects.get(pk=self.other_task.pk).nudge_count, 2)
+        
+        self.assertEquals(self.other_task.toggle_nudge(self.user_joe), False)
+        self.assertEquals(Task.objects.get(pk=self.other_task.pk).nudge_count, 1)
+        self.assertEquals(len(self.other_task.task_nudge.all()), 1)
+    
+    def test_stale_save_keeps_nudges(self):
+        """
+        saving a task loaded before a nudge doesn't write the old counter back
+        """
+        
+        stale = Task.objects.get(pk=self.other_task.pk)
+        self.other_task.toggle_nudge(self.user_joe)
+        stale.summary = "changed after the nudge"
+        # the row check, the update and the tags; the counters aren't reread
+        with self.assertNumQueries(3):
+            stale.save()
+        task = Task.objects.get(pk=self.other_task.pk)
+        self.assertEquals(task.nudge_count, 2)
+        self.assertEquals(task.last_nudged, Nudge.objects.filter(task=task).latest("modified").modified)
+    
+    def test_deleting_nudges(self):
+        """
+        nudges deleted without toggle_nudge, like from the admin, are counted
+        """
+        
+        Nudge.objects.filter(task=self.task)[0].delete()
+        self.assertEquals(Task.objects.get(pk=self.task.pk).nudge_count, self.task_nudge_count - 1)
 
 
 class TestTaskHistory(TestCase):
@@ -124,3 +180,97 @@ class TestTaskHistory(TestCase):
         
         # the person who made the change was joe
         self.assertEquals(history.owner, self.user_joe)
+    
+    def test_bulk_transition(self):
+        """
+        every task in the batch changes state and gets one history row
+        """
+        
+        tasks = Task.objects.filter(pk__in=[1, 2])
+        Task.objects.bulk_transition(tasks, "7", self.user_joe)
+        
+        for task in Task.objects.filter(pk__in=[1, 2]):
+            self.assertEquals(task.state, "7")
+            history = task.history_task.all()
+            self.assertEquals(len(history), 1)
+            self.assertEquals(history[0].state, "7")
+            self.assertEquals(history[0].owner, self.user_joe)
+    
+    def test_compact_history(self):
+        """
+        compact rows only store changed text and reconstruct to full rows
+        """
+        
+        compact, interval = models.COMPACT_HISTORY, models.HISTORY_KEYFRAME_INTERVAL
+        models.COMPACT_HISTORY, models.HISTORY_KEYFRAME_INTERVAL = True, 3
+        try:
+            self.task.save_history()
+            self.task.status = "working on it"
+            self.task.save()
+            self.task.save_history(change_owner=self.user_joe)
+            self.task.state = "4"
+            self.task.save()
+            self.task.save_history(change_owner=self.user_joe)
+            self.task.save_history(change_owner=self.user_joe)
+        finally:
+            models.COMPACT_HISTORY, models.HISTORY_KEYFRAME_INTERVAL = compact, interval
+        
+        stored = list(TaskHistory.objects.filter(task=self.task).order_by("id"))
+        self.assertEquals([row.keyframe_id for row in stored],
+            [None, stored[0].id, stored[0].id, None])
+        self.assertEquals(stored[1].changed_fields, "status")
+        self.assertEquals(stored[2].summary, "")
+        
+        history = TaskHistory.objects.reconstruct(stored)
+        self.assertEquals(history[2].summary, "test task")
+        self.assertEquals(history[2].status, "working on it")
+        self.assertEquals(history[2].state, "4")
+        self.assertEquals(history[3].status, "working on it")
+    
+    def test_compact_history_keeps_tags(self):
+        """
+        a compact row still has its tags, which live in TaggedItem rows
+        """
+        
+        compact = models.COMPACT_HISTORY
+        models.COMPACT_HISTORY = True
+        try:
+            self.task.tags = "urgent"
+            self.task.save()
+            self.task.save_history()
+            self.task.save_history(change_owner=self.user_joe)
+        finally:
+            models.COMPACT_HISTORY = compact
+        
+        stored = list(TaskHistory.objects.filter(task=self.task).order_by("id"))
+        self.assertEquals(stored[1].keyframe_id, stored[0].id)
+        self.assertEquals([tag.name for tag in Tag.objects.get_for_object(stored[1])], ["urgent"])
+
+
+class TestTaskTimeline(TestCase):
+    fixtures = ["test_tasks.json"]
+    
+    def setUp(self):
+        self.task = Task.objects.get(pk__exact=1)
+        self.user_joe = User.objects.get(username__exact="joe")
+    
+    def test_pages(self):
+        """
+        history and nudges come back merged newest first, one page at a time
+        """
+        
+        first = self.task.save_history()
+        second = self.task.save_history(change_owner=self.user_joe)
+        
+        items, older = task_timeline(self.task, limit=3)
+        self.assertEquals(items[:2], [second, first])
+        self.assertEquals(items[2], Nudge.objects.get(pk=2))
+        self.assertEquals(items[0].humanized_state, "new")
+        self.assertEquals([item.position for item in items], [4, 3, 2])
+        
+        # the cursor carries the position, so later pages count nothing
+        with self.assertNumQueries(2):
+            items, older = task_timeline(self.task, limit=3, before=older)
+        self.assertEquals(items, [Nudge.objects.get(pk=1)])
+        self.assertEquals(items[0].position, 1)
+        self.assertEquals(older, None)
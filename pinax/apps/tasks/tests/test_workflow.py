@@ -5,11 +5,13 @@ from django.test import TestCase
 from django.contrib.auth.models import Group
 from django.contrib.auth.models import User
 
+from pinax.apps.tasks import permissions
+from pinax.apps.tasks.engine import CompiledWorkflow
 from pinax.apps.tasks.models import Task
 from pinax.apps.tasks.workflow import always, is_assignee, is_assignee_or_none
 from pinax.apps.tasks.workflow import is_creator, no_assignee, is_task_manager
-from pinax.apps.tasks.workflow import OR
-from pinax.apps.tasks.workflow import TASK_MANAGER
+from pinax.apps.tasks.workflow import OR, per_user
+from pinax.apps.tasks.workflow import STATE_TRANSITIONS, TASK_MANAGER
 
 
 
@@ -85,3 +87,84 @@ class TestWorkflowFunctions(TestCase):
         self.assertEquals(True, OR(is_creator, is_assignee)(self.task, self.user_joe))
         self.assertEquals(False, OR(is_creator, is_assignee)(self.task, None))
         self.assertEquals(False, OR(is_creator, is_assignee)(self.task, self.user_sam))
+
+
+class TestCompiledWorkflow(TestCase):
+    fixtures = ["test_tasks.json"]
+    
+    def setUp(self):
+        self.user_admin = User.objects.get(username__exact="admin")
+        self.user_joe = User.objects.get(username__exact="joe")
+        
+        self.task = Task.objects.get(pk__exact=1)
+        self.task.assignee = self.user_joe
+        self.task.state = "4"
+        self.task.save()
+        self.other_task = Task.objects.get(pk__exact=2)
+        
+        self.group = Group(name=TASK_MANAGER)
+        self.group.save()
+        self.group.user_set.add(self.user_admin)
+    
+    def test_matches_transitions(self):
+        workflow = CompiledWorkflow(STATE_TRANSITIONS)
+        self.assertEquals(workflow.allowable_states(self.task, self.user_joe), [
+            ("4", "still in progress"),
+            ("5", "discussion needed"),
+            ("8", "fix needs review")
+        ])
+        self.assertEquals(workflow.allowable_states(self.task, self.user_admin), [
+            ("4", "still in progress"),
+            ("6", "blocked"),
+            ("8", "fix needs review")
+        ])
+    
+    def test_permissions_run_once(self):
+        calls = []
+        
+        @per_user
+        def counted_manager(task, user):
+            calls.append((task.pk, user.pk))
+            return True
+        
+        workflow = CompiledWorkflow([
+            (4, 5, counted_manager, "discussion needed"),
+            (4, 6, counted_manager, "blocked"),
+            (4, 8, OR(is_assignee, counted_manager), "fix needs review"),
+            (1, 7, counted_manager, "accept"),
+        ])
+        states = workflow.allowable_states_for([self.task, self.other_task], self.user_admin)
+        
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(states[self.task.pk], [
+            ("5", "discussion needed"),
+            ("6", "blocked"),
+            ("8", "fix needs review")
+        ])
+        self.assertEquals(states[self.other_task.pk], [("7", "accept")])
+
+
+class TestRequestPermissionCache(TestCase):
+    fixtures = ["test_tasks.json"]
+    
+    def setUp(self):
+        self.user_admin = User.objects.get(username__exact="admin")
+        self.task = Task.objects.get(pk__exact=1)
+        
+        self.group = Group(name=TASK_MANAGER)
+        self.group.save()
+        self.group.user_set.add(self.user_admin)
+    
+    def tearDown(self):
+        permissions.end()
+    
+    def test_membership_cached_for_request(self):
+        permissions.begin()
+        self.assertEquals(True, is_task_manager(self.task, self.user_admin))
+        
+        # the membership is remembered until the request ends
+        self.group.user_set.remove(self.user_admin)
+        self.assertEquals(True, is_task_manager(self.task, self.user_admin))
+        
+        permissions.end()
+        self.assertEquals(False, is_task_manager(self.task, self.user_admin))
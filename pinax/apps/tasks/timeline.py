@@ -0,0 +1,136 @@
+from __future__ import absolute_import, unicode_literals
+"""
+A task's history and nudges as one newest-first timeline.
+
+Both sources are read already ordered from the database and merged lazily,
+so a page of the timeline never loads more than ``limit + 1`` rows from each
+source. Pages are addressed with an opaque cursor naming the last item shown
+and its number. Items are numbered from the oldest, 1, up, whichever page
+they are shown on; only the first page counts the items to number them.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.importlib import import_module
+
+from pinax.apps.tasks.models import TaskHistory
+
+
+
+workflow = import_module(getattr(settings, "TASKS_WORKFLOW_MODULE", "pinax.apps.tasks.workflow"))
+
+TIMELINE_PAGE_SIZE = getattr(settings, "TASKS_TIMELINE_PAGE_SIZE", 50)
+
+CURSOR_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+# the position of each kind breaks ties between items modified at once
+KINDS = ["nudge", "history"]
+
+
+
+def sort_key(kind, item):
+    return (item.modified, KINDS.index(kind), item.pk)
+
+
+def encode_cursor(kind, item):
+    return "{0},{1},{2},{3}".format(
+        item.modified.strftime(CURSOR_FORMAT), kind, item.pk, item.position
+    )
+
+
+def decode_cursor(cursor):
+    """
+    return the sort key and the position of the item named by a cursor or
+    None if it is malformed.
+    """
+    
+    try:
+        modified, kind, pk, position = cursor.split(",")
+        key = (datetime.strptime(modified, CURSOR_FORMAT), KINDS.index(kind), int(pk))
+        return key, int(position)
+    except (AttributeError, ValueError):
+        return None
+
+
+def older_than(kind, queryset, key):
+    """
+    restrict an ordered source to the items that sort after key.
+    """
+    
+    modified, rank, pk = key
+    older = Q(modified__lt=modified)
+    if KINDS.index(kind) < rank:
+        older |= Q(modified=modified)
+    elif KINDS.index(kind) == rank:
+        older |= Q(modified=modified, pk__lt=pk)
+    return queryset.filter(older)
+
+
+def merge(sources):
+    """
+    k-way merge of (kind, iterable) pairs, each already in descending
+    sort_key order. yields (kind, item) pairs.
+    """
+    
+    heads = []
+    for kind, iterable in sources:
+        iterator = iter(iterable)
+        for item in iterator:
+            heads.append([sort_key(kind, item), kind, item, iterator])
+            break
+    while heads:
+        head = max(heads, key=lambda head: head[0])
+        yield head[1], head[2]
+        for item in head[3]:
+            head[0], head[2] = sort_key(head[1], item), item
+            break
+        else:
+            heads.remove(head)
+
+
+def task_timeline(task, limit=TIMELINE_PAGE_SIZE, before=None):
+    """
+    return a page of the task's history and nudges, newest first, along
+    with the cursor of the next older page (None on the last page). each
+    item's position is its number counting from the oldest.
+    """
+    
+    sources = [
+        ("history", task.history_task.select_related("owner", "assignee")),
+        ("nudge", task.task_nudge.select_related("nudger")),
+    ]
+    named = decode_cursor(before) if before else None
+    
+    if named is None:
+        # the first page numbers its newest item with the number of items
+        key = None
+        position = sum(queryset.count() for kind, queryset in sources)
+    else:
+        key, position = named
+        position -= 1
+    
+    ordered = []
+    for kind, queryset in sources:
+        if key is not None:
+            queryset = older_than(kind, queryset, key)
+        ordered.append((kind, queryset.order_by("-modified", "-id")[:limit + 1]))
+    
+    items, more = [], False
+    for kind, item in merge(ordered):
+        if len(items) == limit:
+            more = True
+            break
+        item.position = position
+        position -= 1
+        items.append((kind, item))
+    cursor = encode_cursor(*items[-1]) if more else None
+    
+    history = TaskHistory.objects.reconstruct(
+        [item for kind, item in items if kind == "history"]
+    )
+    for change in history:
+        change.humanized_state = workflow.STATE_CHOICES_DICT.get(change.state)
+        change.humanized_resolution = workflow.RESOLUTION_CHOICES_DICT.get(change.resolution)
+    
+    return [item for kind, item in items], cursor
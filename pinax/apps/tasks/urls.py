@@ -29,7 +29,9 @@ urlpatterns = patterns("",
     
     # exports
     url(r"^export_state_transitions.csv$", "pinax.apps.tasks.views.export_state_transitions", name="tasks_export_state_transitions"),
+    url(r"^export/tasks\.(?P<format>csv|json)$", "pinax.apps.tasks.views.export_tasks", name="tasks_export"),
+    url(r"^export/history\.(?P<format>csv|json)$", "pinax.apps.tasks.views.export_history", name="tasks_export_history"),
     
     # feeds
-    (r"^feeds/(.*)/$", "django.contrib.syndication.views.feed", tasks_feed_dict),
+    (r"^feeds/(.*)/$", "pinax.utils.feeds.feed", tasks_feed_dict),
 )
\ No newline at end of file
@@ -1,7 +1,5 @@
 from __future__ import absolute_import, unicode_literals
 from datetime import date, datetime, timedelta
-from itertools import chain
-from operator import attrgetter
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist, ImproperlyConfigured
@@ -30,11 +28,16 @@ if "notification" in getattr(settings, "INSTALLED_APPS"):
 else:
     notification = None
 
-from tagging.models import Tag
+from tagging.models import TaggedItem
 
+from pinax.apps.tasks import fanout
+from pinax.apps.tasks.export import export_response
 from pinax.apps.tasks.filters import TaskFilter
 from pinax.apps.tasks.forms import TaskForm, EditTaskForm
+from pinax.apps.tasks.keyset import keyset_page, json_response
 from pinax.apps.tasks.models import Task, TaskHistory, Nudge
+from pinax.apps.tasks.permissions import same_user
+from pinax.apps.tasks.timeline import task_timeline
 
 
 
@@ -96,9 +99,14 @@ def tasks(request, template_name="tasks/task_list.html"):
     filter_data.update(request.GET)
     
     task_filter = TaskFilter(filter_data, queryset=tasks)
+    page = keyset_page(task_filter.qs, request, group)
+    
+    if request.GET.get("format") == "json":
+        return json_response({"tasks": page}, group)
     
     group_by_querydict = request.GET.copy()
     group_by_querydict.pop("group_by", None)
+    group_by_querydict.pop("after", None)
     group_by_querystring = group_by_querydict.urlencode()
     
     ctx = group_context(group, bridge)
@@ -107,7 +115,8 @@ def tasks(request, template_name="tasks/task_list.html"):
         "gbqs": group_by_querystring,
         "is_member": is_member,
         "task_filter": task_filter,
-        "tasks": task_filter.qs,
+        "tasks": page.tasks,
+        "next_page": page.next_querystring(request.GET),
         "querystring": request.GET.urlencode(),
     })
     
@@ -153,13 +162,7 @@ def add_task(request, secret_id=None, form_class=TaskForm, template_name="tasks/
                 messages.add_message(request, messages.SUCCESS,
                     ugettext("added task '%s'") % task.summary
                 )
-                if notification:
-                    if group:
-                        notify_list = group.member_queryset()
-                    else:
-                        notify_list = User.objects.all() # @@@
-                    notify_list = notify_list.exclude(id__exact=request.user.id)
-                    notification.send(notify_list, "tasks_new", {"creator": request.user, "task": task, "group": group})
+                fanout.send(group, request.user, "tasks_new", {"creator": request.user, "task": task, "group": group})
                 if "add-another-task" in request.POST:
                     if group:
                         redirect_to = bridge.reverse("task_add", group)
@@ -203,21 +206,14 @@ def nudge(request, id):
     task = get_object_or_404(tasks, id=id)
     task_url = task.get_absolute_url(group)
     
-    nudged = Nudge.objects.filter(task__exact=task, nudger__exact=request.user)
-    if nudged:
+    if not task.toggle_nudge(request.user):
         # you've already nudged this task.
-        nudge = nudged[0]
-        nudge.delete()
         messages.add_message(request, messages.SUCCESS,
             ugettext("You've removed your nudge from this task")
         )
         return HttpResponseRedirect(task_url)
     
-    
-    nudge = Nudge(nudger=request.user, task=task)
-    nudge.save()
-    
-    count = Nudge.objects.filter(task__exact=task).count()
+    count = task.nudge_count
     
     # send the message to the user
     messages.add_message(request, messages.SUCCESS,
@@ -245,13 +241,7 @@ def task(request, id, template_name="tasks/task.html"):
     else:
         tasks = Task.objects.filter(object_id=None)
     
-    task = get_object_or_404(tasks, id=id)
-    
-    if group:
-        notify_list = group.member_queryset()
-    else:
-        notify_list = User.objects.all()
-    notify_list = notify_list.exclude(id__exact=request.user.id)
+    task = get_object_or_404(tasks.select_related("assignee", "creator"), id=id)
     
     if not request.user.is_authenticated():
         is_member = False
@@ -266,22 +256,20 @@ def task(request, id, template_name="tasks/task.html"):
         if form.is_valid():
             task = form.save()
             task.save_history(change_owner=request.user)
-            if task.assignee == request.user:
+            if same_user(task.assignee_id, request.user):
                 task.denudge()
             if "status" in form.changed_data:
                 messages.add_message(request, messages.SUCCESS,
                     ugettext("updated your status on the task")
                 )
-                if notification:
-                    notification.send(notify_list, "tasks_status", {"user": request.user, "task": task, "group": group})
+                fanout.send(group, request.user, "tasks_status", {"user": request.user, "task": task, "group": group})
             if "state" in form.changed_data:
                 messages.add_message(request, messages.SUCCESS,
                     ugettext("task marked %(state)s") % {
                         "state": task.get_state_display()
                     }
                 )
-                if notification:
-                    notification.send(notify_list, "tasks_change", {"user": request.user, "task": task, "group": group, "new_state": task.get_state_display()})
+                fanout.send(group, request.user, "tasks_change", {"user": request.user, "task": task, "group": group, "new_state": task.get_state_display()})
             if "assignee" in form.changed_data:
                 messages.add_message(request, messages.SUCCESS,
                     ugettext("assigned task to '%(assignee)s'") % {
@@ -289,14 +277,12 @@ def task(request, id, template_name="tasks/task.html"):
                         "assignee": task.assignee
                     }
                 )
-                if notification:
-                    notification.send(notify_list, "tasks_assignment", {"user": request.user, "task": task, "assignee": task.assignee, "group": group})
+                fanout.send(group, request.user, "tasks_assignment", {"user": request.user, "task": task, "assignee": task.assignee, "group": group})
             if "tags" in form.changed_data:
                 messages.add_message(request, messages.SUCCESS,
                     ugettext("updated tags on the task")
                 )
-                if notification:
-                    notification.send(notify_list, "tasks_tags", {"user": request.user, "task": task, "group": group})
+                fanout.send(group, request.user, "tasks_tags", {"user": request.user, "task": task, "group": group})
             form = EditTaskForm(request.user, group, instance=task)
     else:
         form = EditTaskForm(request.user, group, instance=task)
@@ -306,18 +292,23 @@ def task(request, id, template_name="tasks/task.html"):
     nudge["nudgeable"] = False
     
     # get the count of nudges so assignee can see general level of interest.
-    nudge["count"] = Nudge.objects.filter(task__exact=task).count()
+    nudge["count"] = task.nudge_count
     
     # get the nudge if you are not the assignee otherwise just a None
-    if is_member and request.user != task.assignee and task.assignee:
+    if is_member and task.assignee_id is not None and not same_user(task.assignee_id, request.user):
         nudge["nudgeable"] = True
-        try:
-            nudge["nudge"] = Nudge.objects.filter(nudger__exact=request.user, task__exact=task)[0]
-        except IndexError:
-            nudge["nudge"] = None
+        nudge["nudge"] = None
+        if task.nudge_count:
+            try:
+                nudge["nudge"] = Nudge.objects.filter(nudger__exact=request.user, task__exact=task)[0]
+            except IndexError:
+                pass
     
     # get the nudge history
-    nudge["history"] = Nudge.objects.filter(task__exact=task)
+    if task.nudge_count:
+        nudge["history"] = Nudge.objects.filter(task__exact=task).select_related("nudger")
+    else:
+        nudge["history"] = Nudge.objects.none()
     
     ctx = group_context(group, bridge)
     ctx.update({
@@ -379,14 +370,23 @@ def user_tasks(request, username, template_name="tasks/user_tasks.html"):
     assigned_tasks = assigned_tasks.order_by("state", "-modified") # @@@ filter(project__deleted=False)
     created_tasks = created_tasks.order_by("state", "-modified") # @@@ filter(project__deleted=False)
     
-    nudged_tasks = assigned_tasks.extra(
-        tables = ["tasks_nudge"],
-        where = ["tasks_nudge.id = tasks_task.id"],
-    )
+    nudged_tasks = assigned_tasks.filter(nudge_count__gt=0)
     
     nudged_filter = TaskFilter(filter_data, queryset=nudged_tasks, prefix="n")
     nudged_tasks = nudged_filter.qs
     
+    # each list pages on its own cursor
+    assigned_page = keyset_page(assigned_tasks, request, group, param="a-after")
+    created_page = keyset_page(created_tasks, request, group, param="c-after")
+    nudged_page = keyset_page(nudged_tasks, request, group, param="n-after")
+    
+    if request.GET.get("format") == "json":
+        return json_response({
+            "assigned_tasks": assigned_page,
+            "created_tasks": created_page,
+            "nudged_tasks": nudged_page,
+        }, group)
+    
     site_url = "http://" + Site.objects.get_current().domain
     
     if group:
@@ -405,9 +405,12 @@ resizable=yes, status=no, toolbar=no, menuBar=no");}})()""".format(url)
         "assigned_filter": assigned_filter,
         "created_filter": created_filter,
         "nudged_filter": nudged_filter,
-        "assigned_tasks": assigned_tasks,
-        "created_tasks": created_tasks,
-        "nudged_tasks": nudged_tasks,
+        "assigned_tasks": assigned_page.tasks.order_by("state", "-modified"),
+        "created_tasks": created_page.tasks.order_by("state", "-modified"),
+        "nudged_tasks": nudged_page.tasks.order_by("state", "-modified"),
+        "assigned_next_page": assigned_page.next_querystring(request.GET),
+        "created_next_page": created_page.next_querystring(request.GET),
+        "nudged_next_page": nudged_page.next_querystring(request.GET),
         "other_user": other_user,
         "bookmarklet": bookmarklet,
     })
@@ -468,8 +471,6 @@ def focus(request, field, value, template_name="tasks/focus.html"):
     }
     filter_data.update(request.GET)
     
-    task_filter = TaskFilter(filter_data, queryset=tasks)
-    
     if field == "modified":
         try:
             # @@@ this seems hackish and brittle but I couldn't work out another way
@@ -479,7 +480,6 @@ def focus(request, field, value, template_name="tasks/focus.html"):
         except:
             tasks = Task.objects.none() # @@@ or throw 404?
     elif field == "state":
-        task_filter = None # prevent task filtering
         try:
             state = workflow.REVERSE_STATE_CHOICES[value]
         except KeyError:
@@ -495,26 +495,35 @@ def focus(request, field, value, template_name="tasks/focus.html"):
             except User.DoesNotExist:
                 tasks = Task.objects.none() # @@@ or throw 404?
     elif field == "tag":
-        try:
-            # @@@ is there a better way?
-            task_type = ContentType.objects.get_for_model(Task)
-            tasks = tasks.filter(id__in=Tag.objects.get(name=value).items.filter(content_type=task_type).values_list("object_id", flat=True))
-            # @@@ still need to filter on group if group not None
-        except Tag.DoesNotExist:
-            tasks = Task.objects.none() # @@@ or throw 404?
+        # a subquery on the tagged items; tasks is already limited to the group
+        task_type = ContentType.objects.get_for_model(Task)
+        tasks = tasks.filter(id__in=TaggedItem.objects.filter(
+            tag__name = value,
+            content_type = task_type
+        ).values("object_id"))
+    
+    if field == "state":
+        task_filter = None # prevent task filtering
+    else:
+        # filter the focused tasks directly rather than intersecting querysets
+        task_filter = TaskFilter(filter_data, queryset=tasks)
+        tasks = task_filter.qs
     
-    if task_filter is not None:
-        # Django will not merge queries that are both not distinct or distinct
-        tasks = tasks.distinct() & task_filter.qs
+    page = keyset_page(tasks, request, group)
+    
+    if request.GET.get("format") == "json":
+        return json_response({"tasks": page}, group)
     
     group_by_querydict = request.GET.copy()
     group_by_querydict.pop("group_by", None)
+    group_by_querydict.pop("after", None)
     group_by_querystring = group_by_querydict.urlencode()
     
     ctx = group_context(group, bridge)
     ctx.update({
         "task_filter": task_filter,
-        "tasks": tasks,
+        "tasks": page.tasks,
+        "next_page": page.next_querystring(request.GET),
         "field": field,
         "value": value,
         "group_by": group_by,
@@ -537,11 +546,11 @@ def tasks_history_list(request, template_name="tasks/tasks_history_list.html"):
         tasks = group.content_objects(TaskHistory)
     else:
         tasks = TaskHistory.objects.filter(object_id=None)
-    tasks = tasks.order_by("-modified")
+    tasks = tasks.select_related("task", "owner", "assignee").order_by("-modified")
     
     ctx = group_context(group, bridge)
     ctx.update({
-        "task_history": tasks,
+        "task_history": TaskHistory.objects.snapshots(tasks),
         "is_member": is_member,
     })
     
@@ -562,29 +571,37 @@ def tasks_history(request, id, template_name="tasks/task_history.html"):
         tasks = Task.objects.filter(object_id=None)
     
     task = get_object_or_404(tasks, id=id)
-    task_history = task.history_task.all().order_by("-modified")
-    nudge_history = task.task_nudge.all().order_by("-modified")
-    
-    result_list = sorted(
-        chain(task_history, nudge_history),
-        key=attrgetter("modified")
-        )
-    result_list.reverse()
     
-    for change in task_history:
-        change.humanized_state = workflow.STATE_CHOICES_DICT.get(change.state, None)
-        change.humanized_resolution = workflow.RESOLUTION_CHOICES_DICT.get(change.resolution, None)
+    # one page of history and nudges merged newest first; "before" is the
+    # cursor of the last item on the previous page
+    result_list, older = task_timeline(task, before=request.GET.get("before"))
+    nudge_history = [change for change in result_list if isinstance(change, Nudge)]
     
     ctx = group_context(group, bridge)
     ctx.update({
         "task": task,
         "task_history": result_list,
         "nudge_history": nudge_history,
+        "older": older,
     })
     
     return render_to_response(template_name, RequestContext(request, ctx))
 
 
+def export_tasks(request, format="csv"):
+    
+    group, bridge = group_and_bridge(request)
+    
+    return export_response(Task, group, format, "tasks")
+
+
+def export_history(request, format="csv"):
+    
+    group, bridge = group_and_bridge(request)
+    
+    return export_response(TaskHistory, group, format, "task_history")
+
+
 def export_state_transitions(request):
     export = workflow.export_state_transitions()
     return HttpResponse(export, mimetype="text/csv")
@@ -4,7 +4,8 @@ from __future__ import absolute_import, unicode_literals
 We break out workflow elements to enable us to more easily refactor in the
 future.
 """
-from django.contrib.auth.models import Group
+from pinax.apps.tasks.permissions import same_user, user_group_names
+from pinax.apps.tasks.writers import csv_lines, json_lines
 from pinax.utils.compat import any
 
 try:
@@ -15,48 +16,59 @@ except NameError:
 TASK_MANAGER = "coredev"
 
 
+def per_user(f):
+    # marks a permission whose outcome depends only on the user, so the
+    # compiled workflow can share the result across every task it checks
+    f.per_user = True
+    return f
+
+
 def always(task, user):
     return True
 
 
 def is_assignee(task, user):
-    if task.assignee == user:
+    if same_user(task.assignee_id, user):
         return True
     return False
 
 
 def is_assignee_or_none(task, user):
     # current user is assignee or there is no assignee
-    if task.assignee == user or not task.assignee:
+    if same_user(task.assignee_id, user) or task.assignee_id is None:
         return True
     return False
 
 
 def is_creator(task, user):
-    if task.creator == user:
+    if same_user(task.creator_id, user):
         return True
     return False
 
 
+@per_user
 def is_task_manager(task, user):
     if not user or user.is_anonymous():
         return False
     if user.is_superuser:
         return True
-    if Group.objects.filter(name__exact=TASK_MANAGER).filter(user=user):
+    if TASK_MANAGER in user_group_names(user):
         return True
     return False
 
 
 def no_assignee(task, user):
-    if not task.assignee:
+    if task.assignee_id is None:
         return True
     return False
 
 
 def OR(*l):
     # lets you run multiple permissions against a single state transition
-    return lambda *args: any(f(*args) for f in l)
+    predicate = lambda *args: any(f(*args) for f in l)
+    # expose the operands so the compiled workflow can memoize each of them
+    predicate.predicates = l
+    return predicate
 
 
 STATE_TRANSITIONS = [
@@ -145,24 +157,27 @@ STATE_ID_LIST = [x[0] for x in STATE_CHOICES]
 
 
 
+def permission_name(permission):
+    operands = getattr(permission, "predicates", None)
+    if operands is not None:
+        return "OR({0})".format(", ".join(permission_name(f) for f in operands))
+    return permission.__name__
+
+
 def export_state_transitions(format="csv"):
-    # ugly cowboy code that really needs refactoring
-    rows = []
-    for row in STATE_TRANSITIONS:
-        record = ""
-        current_state = STATE_CHOICES_DICT[str(row[0])]
-        new_state = STATE_CHOICES_DICT[str(row[1])]
-        permission = str(row[2]).split()[1]
-        transition_name = row[3]
-        record = """ "{0}","{1}","{2}","{3}" """.format(current_state, new_state, permission, transition_name)
-        rows.append(record.strip())
-    
-    # ick turn this into a string.
-    # TODO: to this right!
-    text = ""
-    for row in rows:
-        text += row + "\n"
-    return text
+    rows = (
+        (
+            STATE_CHOICES_DICT[str(row[0])],
+            STATE_CHOICES_DICT[str(row[1])],
+            permission_name(row[2]),
+            row[3],
+        )
+        for row in STATE_TRANSITIONS
+    )
+    if format == "json":
+        header = ["current_state", "new_state", "permission", "transition"]
+        return "".join(json_lines(header, rows))
+    return "".join(csv_lines(None, rows))
 
 # lame hack to speed up shell scripts
 ext = export_state_transitions
@@ -0,0 +1,78 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Generator based CSV and JSON writers used by the task exports.
+
+Both take an iterable of rows and yield the document a line at a time, so
+exporting never holds more than one row in memory.
+"""
+import csv
+import json
+from datetime import date, datetime
+
+try:
+    str = unicode  # Python 2.* compatible
+    PY2 = True
+except NameError:
+    PY2 = False
+
+
+
+class Echo(object):
+    """
+    file-like object handing back what csv.writer writes.
+    """
+    
+    def write(self, value):
+        return value
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S")
+    value = str(value)
+    if PY2:
+        # the Python 2 csv module only handles byte strings
+        value = value.encode("utf-8")
+    return value
+
+
+def csv_lines(header, rows):
+    """
+    yield header and then each row as a fully quoted CSV line.
+    """
+    
+    writer = csv.writer(Echo(), quoting=csv.QUOTE_ALL, lineterminator="\n")
+    if header:
+        yield writer.writerow([csv_value(value) for value in header])
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def json_lines(header, rows):
+    """
+    yield a JSON array of objects keyed by header, one object per line.
+    """
+    
+    yield "[\n"
+    previous = None
+    for row in rows:
+        if previous is not None:
+            yield previous + ",\n"
+        previous = json.dumps(dict(zip(header, row)), default=json_value)
+    if previous is not None:
+        yield previous + "\n"
+    yield "]\n"
+
+
+WRITERS = {
+    "csv": (csv_lines, "text/csv"),
+    "json": (json_lines, "application/json"),
+}
@@ -0,0 +1,77 @@
+from __future__ import absolute_import, unicode_literals
+""" Microbenchmark of the Creole HtmlEmitter.
+
+Compares the buffered emit() against the recursive emit_node() on large
+generated Creole documents with deep lists and big tables, after checking
+that both write the same HTML. Run from the root of a Pinax checkout::
+
+    python -m pinax.apps.wiki.benchmarks --sections 200 --repeat 5
+"""
+import optparse
+import sys
+import timeit
+
+from creole import Parser
+
+from pinax.apps.wiki.creole2html import HtmlEmitter
+
+
+def document(sections):
+    """ Returns a Creole document of the given number of sections, each with
+    a paragraph, a list nested six levels deep and a 20x6 table.
+    """
+    lines = []
+    for i in range(sections):
+        lines.append('== Section {0}'.format(i))
+        lines.append('Some **bold** and //italic// text with a [[Link{0}|link]] '
+                     'and http://example.com/{0} in it.'.format(i))
+        lines.append('')
+        for depth in range(1, 7):
+            for item in range(3):
+                lines.append('{0} item {1} with **strong //nested//** text'.format(
+                    '*' * depth, item
+                ))
+        lines.append('')
+        for row in range(20):
+            lines.append('|=head {0}|{1}|'.format(
+                row, '|'.join('cell //{0}// **{1}**'.format(row, col) for col in range(5))
+            ))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--sections',
+        dest='sections',
+        default=200,
+        type='int',
+        help='sections in the generated document',
+    )
+    parser.add_option('--repeat',
+        dest='repeat',
+        default=5,
+        type='int',
+        help='timing runs; the best one is reported',
+    )
+    options, args = parser.parse_args()
+
+    root = Parser(document(options.sections)).parse()
+    emitter = HtmlEmitter(root)
+    html = emitter.emit()
+    if html != emitter.emit_node(root):
+        sys.stderr.write('emit() and emit_node() disagree\n')
+        sys.exit(1)
+
+    recursive = min(timeit.repeat(lambda: emitter.emit_node(root), number=1, repeat=options.repeat))
+    buffered = min(timeit.repeat(emitter.emit, number=1, repeat=options.repeat))
+    size = len(html) / 1024.0 / 1024.0
+
+    sys.stdout.write('{0:.2f} MB of HTML\n'.format(size))
+    sys.stdout.write('recursive: {0:.3f}s ({1:.2f} MB/s)\n'.format(recursive, size / recursive))
+    sys.stdout.write('buffered:  {0:.3f}s ({1:.2f} MB/s)\n'.format(buffered, size / buffered))
+    sys.stdout.write('speedup:   {0:.2f}x\n'.format(recursive / buffered))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,13 @@
 from cache_tagging.django_cache_tagging import registry
 from .models import Article
+from .rendering import article_cache_tag
 
 
 def article_invalidator(*a, **kw):
     """Returns tags for cache invalidation"""
     obj = kw['instance']
     tags = []
-    tags.append('wiki.article.pk:{0}'.format(obj.pk))
+    tags.append(article_cache_tag(obj))
     return tags
 
 caches = [
@@ -128,6 +128,12 @@ XXX This might be considered a bug, but it's impossible to detect in general.
 
 >>> parse(u'[[http://example.com|test]]')
 <p><a href="http://example.com">test</a></p>
+
+The buffered emit() writes the same HTML as the recursive emit_node():
+
+>>> root = Parser(u'* one\n** [[two|//three//]]\n|=a|b|\n**c**').parse()
+>>> HtmlEmitter(root).emit() == HtmlEmitter(root).emit_node(root)
+True
 """
 
 from __future__ import absolute_import, unicode_literals
@@ -154,6 +160,21 @@ class HtmlEmitter:
             Rules.interwiki,
         ]), re.X | re.U) # for addresses
 
+    # markup written around the children of container nodes by emit()
+    wrappers = {
+        'document': ('', ''),
+        'paragraph': ('<p>', '</p>\n'),
+        'bullet_list': ('<ul>\n', '</ul>\n'),
+        'number_list': ('<ol>\n', '</ol>\n'),
+        'list_item': ('<li>', '</li>\n'),
+        'table': ('<table>\n', '</table>\n'),
+        'table_row': ('<tr>', '</tr>\n'),
+        'table_cell': ('<td>', '</td>'),
+        'table_head': ('<th>', '</th>'),
+        'emphasis': ('<i>', '</i>'),
+        'strong': ('<b>', '</b>'),
+    }
+
     def __init__(self, root):
         self.root = root
 
@@ -220,23 +241,22 @@ class HtmlEmitter:
     def code_emit(self, node):
         return '<tt>{0}</tt>'.format(self.html_escape(node.content))
 
-    def link_emit(self, node):
+    def link_start(self, node):
         target = node.content
-        if node.children:
-            inside = self.emit_children(node)
-        else:
-            inside = self.html_escape(target)
         m = self.addr_re.match(target)
         if m:
             if m.group('extern_addr'):
-                return '<a href="{0}">{1}</a>'.format(
-                    self.attr_escape(target), inside
-                )
+                return '<a href="{0}">'.format(self.attr_escape(target))
             elif m.group('inter_wiki'):
                 raise NotImplementedError
-        return '<a href="{0}">{1}</a>'.format(
-            self.attr_escape(target), inside
-        )
+        return '<a href="{0}">'.format(self.attr_escape(target))
+
+    def link_emit(self, node):
+        if node.children:
+            inside = self.emit_children(node)
+        else:
+            inside = self.html_escape(node.content)
+        return '{0}{1}</a>'.format(self.link_start(node), inside)
 
     def image_emit(self, node):
         target = node.content
@@ -278,10 +298,81 @@ class HtmlEmitter:
         emit = getattr(self, '{0}_emit'.format(node.kind), self.default_emit)
         return emit(node)
 
+    # markup of nodes without children that emit() writes as is
+    constants = {
+        'separator': '<hr>',
+        'break': '<br>',
+    }
+
+    # (wrappers, constants, plain text, plain links) by emitter class
+    _tables = {}
+
+    @classmethod
+    def emit_tables(cls):
+        """Return the markup emit() writes itself for this class, leaving
+        out the kinds whose *_emit method a subclass overrides. Computed
+        once per class.
+        """
+
+        try:
+            return cls._tables[cls]
+        except KeyError:
+            pass
+
+        def plain(kind):
+            name = '{0}_emit'.format(kind)
+            return getattr(cls, name) == getattr(HtmlEmitter, name)
+
+        tables = cls._tables[cls] = (
+            dict((kind, wrapper) for kind, wrapper in cls.wrappers.items() if plain(kind)),
+            dict((kind, markup) for kind, markup in cls.constants.items() if plain(kind)),
+            plain('text') and cls.html_escape == HtmlEmitter.html_escape,
+            plain('link'),
+        )
+        return tables
+
+    def emit_into(self, out):
+        """Emit the document into the list out, one piece at a time.
+
+        The tree is walked with an explicit stack of child iterators instead
+        of recursion, and container nodes append their opening and closing
+        markup around their children rather than joining them into
+        intermediate strings. Text and constant markup are written inline;
+        kinds whose *_emit method is overridden by a subclass are emitted
+        through that method.
+        """
+
+        wrappers, constants, plain_text, plain_links = self.emit_tables()
+        append = out.append
+        stack = [(iter((self.root,)), '')]
+        while stack:
+            children, end = stack[-1]
+            for node in children:
+                kind = node.kind
+                if kind == 'text' and plain_text:
+                    append(node.content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'))
+                elif kind in wrappers:
+                    start, close = wrappers[kind]
+                    append(start)
+                    stack.append((iter(node.children), close))
+                    break
+                elif kind in constants:
+                    append(constants[kind])
+                elif kind == 'link' and node.children and plain_links:
+                    append(self.link_start(node))
+                    stack.append((iter(node.children), '</a>'))
+                    break
+                else:
+                    append(self.emit_node(node))
+            else:
+                stack.pop()
+                append(end)
+        return out
+
     def emit(self):
         """Emit the document represented by self.root DOM tree."""
 
-        return self.emit_node(self.root)
+        return ''.join(self.emit_into([]))
 
 if __name__=="__main__":
     import sys
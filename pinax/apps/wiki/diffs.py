@@ -0,0 +1,141 @@
+from __future__ import absolute_import, unicode_literals
+""" Line based diffs between article revisions.
+
+Lines shared at the start and at the end of the two texts are matched
+without running the sequence matcher, which for wiki edits usually leaves
+it a few lines to compare. Diffs of a pair of revisions are cached, since
+revisions never change.
+"""
+import difflib
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    WIKI_DIFF_CACHE_TIMEOUT = settings.WIKI_DIFF_CACHE_TIMEOUT
+except AttributeError:
+    WIKI_DIFF_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def line_opcodes(a, b):
+    """ Returns difflib style opcodes turning the list of lines a into b."""
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a_end = len(a) - suffix
+    b_end = len(b) - suffix
+
+    opcodes = []
+    if prefix:
+        opcodes.append(('equal', 0, prefix, 0, prefix))
+    if prefix < a_end and prefix < b_end:
+        matcher = difflib.SequenceMatcher(None, a[prefix:a_end], b[prefix:b_end])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    elif prefix < a_end:
+        opcodes.append(('delete', prefix, a_end, prefix, prefix))
+    elif prefix < b_end:
+        opcodes.append(('insert', prefix, prefix, prefix, b_end))
+    if suffix:
+        opcodes.append(('equal', a_end, len(a), b_end, len(b)))
+    return opcodes
+
+
+class _Opcodes(difflib.SequenceMatcher):
+    """ A SequenceMatcher answering with opcodes computed beforehand, to get
+    difflib's grouping of changes with their context.
+    """
+
+    def __init__(self, opcodes):
+        difflib.SequenceMatcher.__init__(self, None, [], [])
+        self.opcodes = opcodes
+
+    def get_opcodes(self):
+        return self.opcodes
+
+
+class Diff(object):
+    """ The differences between two texts, line by line.
+    """
+
+    def __init__(self, a, b, opcodes=None):
+        self.a = a.splitlines() if not isinstance(a, list) else a
+        self.b = b.splitlines() if not isinstance(b, list) else b
+        if opcodes is None:
+            opcodes = line_opcodes(self.a, self.b)
+        self.opcodes = opcodes
+
+    def has_changes(self):
+        return any(tag != 'equal' for tag, i1, i2, j1, j2 in self.opcodes)
+
+    def unified(self, context=3, fromfile='', tofile=''):
+        """ Returns the lines of a unified diff, like difflib.unified_diff."""
+        lines = []
+        for group in _Opcodes(self.opcodes).get_grouped_opcodes(context):
+            if not lines:
+                lines.append('--- {0}'.format(fromfile))
+                lines.append('+++ {0}'.format(tofile))
+            first, last = group[0], group[-1]
+            lines.append('@@ -{0} +{1} @@'.format(
+                _range(first[1], last[2]), _range(first[3], last[4])
+            ))
+            for tag, i1, i2, j1, j2 in group:
+                if tag == 'equal':
+                    lines.extend(' ' + line for line in self.a[i1:i2])
+                    continue
+                lines.extend('-' + line for line in self.a[i1:i2])
+                lines.extend('+' + line for line in self.b[j1:j2])
+        return lines
+
+    def side_by_side(self, context=None):
+        """ Returns rows of (tag, old line number, old line, new line number,
+        new line) to show the texts next to each other. Line numbers start
+        at 1 and are None where a side has no line. With context, only that
+        many unchanged lines are kept around each change.
+        """
+        if context is None:
+            groups = [self.opcodes]
+        else:
+            groups = _Opcodes(self.opcodes).get_grouped_opcodes(context)
+        rows = []
+        for group in groups:
+            for tag, i1, i2, j1, j2 in group:
+                for k in range(max(i2 - i1, j2 - j1)):
+                    i, j = i1 + k, j1 + k
+                    rows.append((
+                        tag,
+                        i + 1 if i < i2 else None,
+                        self.a[i] if i < i2 else None,
+                        j + 1 if j < j2 else None,
+                        self.b[j] if j < j2 else None,
+                    ))
+        return rows
+
+
+def _range(start, stop):
+    # the line range of a hunk header, as difflib writes it
+    length = stop - start
+    if length == 1:
+        return '{0}'.format(start + 1)
+    if not length:
+        start -= 1
+    return '{0},{1}'.format(start + 1, length)
+
+
+def revision_diff(revision_a, revision_b, content):
+    """ Returns the Diff between two revisions of an article.
+
+    content(revision) returns the body of the article at a revision; it is
+    only called when the diff of the pair isn't cached yet.
+    """
+    key = 'wiki.diff:{0}:{1}'.format(revision_a.pk, revision_b.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        return Diff(*cached)
+    diff = Diff(content(revision_a), content(revision_b))
+    cache.set(key, (diff.a, diff.b, diff.opcodes), WIKI_DIFF_CACHE_TIMEOUT)
+    return diff
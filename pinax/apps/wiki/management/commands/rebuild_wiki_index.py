@@ -0,0 +1,16 @@
+from __future__ import absolute_import, unicode_literals
+from django.core.management.base import NoArgsCommand
+
+from pinax.apps.wiki.models import Article, ArticleTerm
+
+
+class Command(NoArgsCommand):
+
+    help = "Rebuilds the search index of all wiki articles"
+
+    def handle_noargs(self, **options):
+        count = 0
+        for article in Article.objects.all().iterator():
+            ArticleTerm.objects.index(article)
+            count += 1
+        self.stdout.write("Indexed {0} articles\n".format(count))
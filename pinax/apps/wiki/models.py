@@ -8,13 +8,19 @@ from django.contrib.sites.models import Site
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
-from django.db.models.query import QuerySet
+from django.db.models import Max
 
 import versioning
+from diff_match_patch import diff_match_patch
 from pinax.core.urlresolvers import reverse_full
+from pinax.apps.wiki.rendering import invalidate_titles, prerender
+from pinax.apps.wiki.utils import search_terms
 from pinax.utils.helper import helper
+from pinax.utils.prefetch import PrefetchQuerySet, generic_objects
+from pinax.utils.search import TermManager
 from django_markup.markup import formatter
-from versioning.utils import revisions_for_object
+from versioning.models import Revision
+from versioning.utils import diff_split_by_fields, revisions_for_object
 from tagging.fields import TagField
 from tagging.models import Tag
 from threadedcomments.models import ThreadedComment
@@ -115,13 +121,32 @@ class Article(models.Model):
 
     non_removed_objects = NonRemovedArticleManager()
 
-    class QuerySet(QuerySet):
+    class QuerySet(PrefetchQuerySet):
+
+        def with_latest_revision(self):
+            """ Fetches the latest revision (with its editor) and the group
+            of the articles with a constant number of queries per chunk of
+            articles, instead of one query per article for
+            latest_changeset and group.
+            """
+            return self.prefetch(prefetch_latest_revisions)
 
         def get_by(self, title, group=None):
             if group is None:
                 return self.get(object_id=None, title=title)
             return group.content_objects(self.filter(title=title)).get()
 
+        def existing_titles(self, titles, group=None):
+            """Returns which of titles are articles of group, in one query."""
+            if not titles:
+                return set()
+            qs = self.filter(title__in=list(titles))
+            if group is None:
+                qs = qs.filter(object_id=None)
+            else:
+                qs = group.content_objects(qs)
+            return set(qs.values_list('title', flat=True))
+
     class Meta:
         verbose_name = _('Article')
         verbose_name_plural = _('Articles')
@@ -129,6 +154,20 @@ class Article(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # new, renamed, removed and restored articles change which links of
+        # the group's articles are red
+        titles_changed = self.pk is None or not Article.objects.filter(
+            pk=self.pk, title=self.title, removed=self.removed
+        ).exists()
+        super(Article, self).save(*args, **kwargs)
+        ArticleTerm.objects.index(self)
+        if titles_changed:
+            invalidate_titles(self.group)
+        # after saving, so the cache invalidation of the save doesn't
+        # throw the fresh rendering away
+        prerender(self)
+
     def get_absolute_url(self, **kwargs):
         if self.group is None:
             return urlresolvers.reverse(
@@ -197,11 +236,99 @@ class Article(models.Model):
         return False
 
     def latest_changeset(self):
+        if hasattr(self, '_latest_changeset'):
+            return self._latest_changeset
         try:
             return revisions_for_object(self)[0]
         except IndexError:
             return None
 
+    def content_at(self, revision):
+        """ Returns the content of the article as of revision.
+
+        Each revision stores the patch undoing its changes, so the content
+        is rebuilt by applying those of the later revisions to the current
+        content, latest first.
+        """
+        later = Revision.objects.filter(
+            content_type=ContentType.objects.get_for_model(self),
+            object_id=self.pk,
+            revision__gt=revision.revision,
+        ).order_by('-revision')
+        dmp = diff_match_patch()
+        content = self.content
+        for change in later:
+            for field, patch in diff_split_by_fields(change.delta).items():
+                if field.split('.')[-1] == 'content':
+                    content = dmp.patch_apply(dmp.patch_fromText(patch), content)[0]
+        return content
+
+
+def prefetch_latest_revisions(articles):
+    """ Sets the latest revision and the group of each of articles: one
+    query for the ids of the revisions, one for the revisions and one per
+    type of group.
+    """
+    if not articles:
+        return
+    content_type = ContentType.objects.get_for_model(Article)
+    latest = Revision.objects.filter(
+        content_type=content_type,
+        object_id__in=[article.pk for article in articles],
+    ).values('object_id').annotate(latest=Max('pk'))
+    revisions = Revision.objects.select_related('editor').in_bulk(
+        [row['latest'] for row in latest]
+    )
+    by_article = dict(
+        (int(revision.object_id), revision) for revision in revisions.values()
+    )
+
+    for article in articles:
+        article._latest_changeset = by_article.get(article.pk)
+    groups = generic_objects(
+        (article.content_type_id, article.object_id)
+        for article in articles if article.object_id is not None
+    )
+    for article in articles:
+        if article.object_id is None:
+            article._group_cache = None
+        elif (article.content_type_id, article.object_id) in groups:
+            article._group_cache = groups[(article.content_type_id, article.object_id)]
+
+
+class ArticleTermManager(TermManager):
+
+    object_field = 'article'
+    # how much an occurrence of a term counts in each field
+    FIELD_WEIGHTS = (
+        ('title', 10),
+        ('summary', 3),
+        ('content', 1),
+    )
+
+    def terms(self, text):
+        return search_terms(text)
+
+    def index(self, article):
+        """ Brings the terms of an article in line with its current title,
+        summary and content. Removed articles have no terms.
+        """
+        if article.removed:
+            self.filter(article=article).delete()
+            return
+        super(ArticleTermManager, self).index(article)
+
+
+class ArticleTerm(models.Model):
+    """ An entry of the inverted index used to search articles: a term and
+    how much of the article it makes up.
+    """
+    article = models.ForeignKey(Article, related_name='terms')
+    term = models.CharField(max_length=50, db_index=True)
+    weight = models.PositiveIntegerField()
+
+    objects = ArticleTermManager()
+
 
 def subscribe_creator(sender, instance, created, **kwargs):
     if notification and created and isinstance(instance, Article):
@@ -242,6 +369,11 @@ def object_comment(sender, instance, created, **kwargs):
                 }
             )
 
+def article_deleted(sender, instance, **kwargs):
+    invalidate_titles(instance.group)
+
+models.signals.post_delete.connect(article_deleted, sender=Article)
+
 if notification is not None:
     signals.post_save.connect(notification.handle_observations, sender=Article)
     signals.post_save.connect(subscribe_creator, sender=Article)
@@ -0,0 +1,102 @@
+from __future__ import absolute_import, unicode_literals
+""" Cached rendering of wiki articles.
+
+The body of an article is rendered when the article is saved and the HTML is
+kept in the cache under the article's revision and markup. The entry is
+tagged with the article, so the invalidation in wiki/caches.py drops it
+whenever the article changes, and with the titles of its group, which are
+invalidated when an article of the group is created, renamed or removed.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.safestring import mark_safe
+
+from django.contrib.contenttypes.models import ContentType
+
+from cache_tagging.django_cache_tagging import cache
+from django_markup.markup import formatter
+
+try:
+    from creole import Parser as CreoleParser
+    from pinax.apps.wiki.creole2html import HtmlEmitter
+except ImportError:
+    CreoleParser = None
+
+try:
+    WIKI_RENDER_CACHE_TIMEOUT = settings.WIKI_RENDER_CACHE_TIMEOUT
+except AttributeError:
+    WIKI_RENDER_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def article_cache_tag(article):
+    return 'wiki.article.pk:{0}'.format(article.pk)
+
+
+def titles_cache_tag(group):
+    """ Tag of everything that depends on which articles a group has."""
+    if group is None:
+        return 'wiki.titles'
+    return 'wiki.titles:{0}:{1}'.format(
+        ContentType.objects.get_for_model(group).pk, group.pk
+    )
+
+
+def invalidate_titles(group):
+    cache.invalidate_tags(titles_cache_tag(group))
+
+
+def render_cache_key(article):
+    """ Key of the rendered body of the current revision of an article."""
+    return 'wiki.render:{0}:{1}:{2}'.format(
+        article.pk,
+        article.last_update.strftime('%Y%m%d%H%M%S%f'),
+        article.markup or ''
+    )
+
+
+def render(article):
+    """ Renders the body of an article like the apply_markup and wiki_links
+    filters would, marking links to missing articles as new. The titles
+    linked to are looked up with one query.
+    """
+    from pinax.apps.wiki.templatetags.wiki_tags import rewrite_links, wiki_words
+    group = article.group
+    html = formatter(article.content, filter_name=article.markup)
+    existing = article.__class__.non_removed_objects.all().existing_titles(
+        wiki_words(html), group
+    )
+    return mark_safe(''.join(rewrite_links(html, group, existing)))
+
+
+def prerender(article):
+    """ Renders an article and stores the HTML for its current revision."""
+    html = render(article)
+    cache.set(render_cache_key(article), html,
+              tags=[article_cache_tag(article), titles_cache_tag(article.group)],
+              timeout=WIKI_RENDER_CACHE_TIMEOUT)
+    return html
+
+
+def rendered_content(article):
+    """ Returns the HTML body of an article, rendering it only when its
+    current revision isn't in the cache.
+    """
+    if article.pk is None:
+        return render(article)
+    html = cache.get(render_cache_key(article))
+    if html is None:
+        html = prerender(article)
+    return mark_safe(html)
+
+
+def creole_to_html(text):
+    """ Renders Creole markup, reusing the HTML of a text rendered before."""
+    key = 'wiki.creole:{0}'.format(
+        hashlib.md5(text.encode('utf-8')).hexdigest()
+    )
+    html = cache.get(key)
+    if html is None:
+        html = HtmlEmitter(CreoleParser(text).parse()).emit()
+        cache.set(key, html, timeout=WIKI_RENDER_CACHE_TIMEOUT)
+    return html
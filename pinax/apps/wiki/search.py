@@ -0,0 +1,99 @@
+from __future__ import absolute_import, unicode_literals
+""" Ranked search of wiki articles over the ArticleTerm inverted index.
+
+An article matches when it has every term of the query; matches are ranked
+by the summed weight of those terms, which counts title words above summary
+words above content words.
+"""
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from pinax.apps.wiki.models import ArticleTerm, prefetch_latest_revisions
+from pinax.apps.wiki.utils import WORD_RE, search_terms
+
+SNIPPET_LENGTH = 200
+
+
+def snippet(text, terms, length=SNIPPET_LENGTH):
+    """ Returns an escaped excerpt of text around the first of terms it
+    contains, with the matching words in bold.
+    """
+    text = text or ''
+    start = 0
+    for match in WORD_RE.finditer(text):
+        if set(search_terms(match.group(0))) & terms:
+            start = max(match.start() - length // 4, 0)
+            # don't start in the middle of a word
+            space = text.find(' ', start, match.start())
+            if start and space != -1:
+                start = space + 1
+            break
+    excerpt = text[start:start + length]
+    html = []
+    pos = 0
+    for match in WORD_RE.finditer(excerpt):
+        if set(search_terms(match.group(0))) & terms:
+            html.append(escape(excerpt[pos:match.start()]))
+            html.append('<b>{0}</b>'.format(escape(match.group(0))))
+            pos = match.end()
+    html.append(escape(excerpt[pos:]))
+    if start:
+        html.insert(0, '&hellip;')
+    if start + length < len(text):
+        html.append('&hellip;')
+    return mark_safe(''.join(html))
+
+
+class SearchResults(object):
+    """ The articles matching a query, in rank order.
+
+    Can be counted and sliced like a queryset, so it can be paginated; a
+    slice costs one query for the ranked ids and one for the articles, which
+    get the search_score and search_snippet attributes.
+    """
+
+    def __init__(self, query, articles):
+        self.articles = articles
+        self.terms = set(search_terms(query))
+        self._count = None
+
+    def matches(self):
+        return ArticleTerm.objects.matches(self.terms, self.articles)
+
+    def count(self):
+        if self._count is None:
+            self._count = self.matches().count() if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:self.count()])
+
+    def __getitem__(self, k):
+        if not isinstance(k, slice):
+            results = self[k:k + 1]
+            if not results:
+                raise IndexError(k)
+            return results[0]
+        if not self.terms:
+            return []
+        ranked = list(self.matches().order_by('-score', '-article')[k])
+        articles = self.articles.model.objects.in_bulk(
+            [row['article'] for row in ranked]
+        )
+        results = []
+        for row in ranked:
+            article = articles[row['article']]
+            article.search_score = row['score']
+            article.search_snippet = snippet(article.content, self.terms)
+            results.append(article)
+        # the teasers of the results show their last editor
+        prefetch_latest_revisions(results)
+        return results
+
+
+def search_articles(query, articles):
+    """ Searches articles, a queryset already scoped to a group, for query."""
+    return SearchResults(query, articles)
@@ -5,11 +5,7 @@ from __future__ import absolute_import, unicode_literals
 from django import template
 from django.conf import settings
 
-try:
-    from .creole import Parser as CreoleParser
-    from creole2html import HtmlEmitter
-except ImportError:
-    CreoleParser = None
+from pinax.apps.wiki.rendering import CreoleParser, creole_to_html
 
 
 register = template.Library()
@@ -22,9 +18,7 @@ def creole(text, **kw):
     if CreoleParser is None and settings.DEBUG:
         raise template.TemplateSyntaxError("Error in creole filter: "
             "The Creole library isn't installed, try easy_install creole.")
-    parser = CreoleParser(text)
-    emitter = HtmlEmitter(parser.parse())
-    return emitter.emit()
+    return creole_to_html(text)
 
 class CreoleTextNode(template.Node):
     def __init__(self, nodelist):
@@ -9,11 +9,8 @@ from template_utils.markup import formatter
 # when loading this module.
 from template_utils.templatetags.generic_markup import *
 
-try:
-    from .creole import Parser as CreoleParser
-    from creole2html import HtmlEmitter
-except ImportError:
-    CreoleParser = None
+from pinax.apps.wiki.models import Article
+from pinax.apps.wiki.rendering import CreoleParser, creole_to_html, rendered_content
 
 def creole(text, **kw):
     """Returns the text rendered by the Creole markup.
@@ -21,9 +18,7 @@ def creole(text, **kw):
     if CreoleParser is None and settings.DEBUG:
         raise template.TemplateSyntaxError("Error in creole filter: "
             "The Creole library isn't installed, try easy_install creole.")
-    parser = CreoleParser(text)
-    emitter = HtmlEmitter(parser.parse())
-    return emitter.emit()
+    return creole_to_html(text)
 
 if CreoleParser is not None:
     formatter.register('creole', creole)
@@ -55,7 +50,11 @@ def render_content(article, content_attr='content', markup_attr='markup'):
         {# essay have a content and markup_lang attributes #}
         {% render_content essay 'content' 'markup_lang' %}
 
+    The body of an Article is served pre-rendered for its current revision.
+
     """
+    if isinstance(article, Article) and (content_attr, markup_attr) == ('content', 'markup'):
+        return {'rendered': rendered_content(article)}
     return {
         'content': getattr(article, content_attr),
         'markup': getattr(article, markup_attr)
@@ -4,15 +4,15 @@ import re
 import copy
 
 from django import template
-from django.core.urlresolvers import reverse
+from django.conf import settings
+from django.core.urlresolvers import get_script_prefix, get_urlconf, reverse
 from django.template.defaultfilters import stringfilter
-from django.utils.encoding import force_unicode
-from django.utils.html import conditional_escape, escape
 from django.utils.http import urlquote
 from django.utils.functional import curry
 from django.utils.safestring import mark_safe, SafeData
 
 from pinax.apps.wiki.forms import WIKI_WORD_RE, camel_case_pattern
+from pinax.apps.wiki.rendering import rendered_content
 
 
 register = template.Library()
@@ -22,7 +22,43 @@ wikiword_link = re.compile(r'(\!?(?:\.?\./)*\b{0})\b'.format(WIKI_WORD_RE), re.U
 wikiword_link_href = re.compile(r'^(\!?(?:\.?\./)*{0})$'.format(WIKI_WORD_RE), re.U | re.S)
 
 
-def _re_callback(match, inside=False, group=None):
+# the tags and comments of an HTML document, everything between them is text
+tag_or_comment = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)[^>]*>', re.S)
+href_attr = re.compile(r"""(\shref\s*=\s*)(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.I)
+class_attr = re.compile(r"""(\sclass\s*=\s*)(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.I)
+# elements whose content is not HTML text
+raw_text_elements = ('script', 'style')
+
+# (urlconf, script prefix, group type, group id, title) -> article url
+_article_urls = {}
+ARTICLE_URLS_MAX = 10000
+
+
+def article_url(title, group=None):
+    """Returns the url of the wiki article title, memoizing the reverse."""
+    key = (
+        get_urlconf() or settings.ROOT_URLCONF,
+        get_script_prefix(),
+        group.__class__ if group else None,
+        group.pk if group else None,
+        title,
+    )
+    try:
+        return _article_urls[key]
+    except KeyError:
+        pass
+    if group:
+        bridge = group.content_bridge
+        url = bridge.reverse('wiki_article', group, kwargs={'title': title, })
+    else:
+        url = reverse('wiki_article', kwargs={'title': title, })
+    if len(_article_urls) >= ARTICLE_URLS_MAX:
+        _article_urls.clear()
+    _article_urls[key] = url
+    return url
+
+
+def _re_callback(match, inside=False, group=None, existing=None):
     """Regexp callback"""
     title = match.group(1)
     # escaped
@@ -32,50 +68,150 @@ def _re_callback(match, inside=False, group=None):
     if title[0] in ('.', '/'):
         url = urlquote(title, safe='/')
     else:
-        if group:
-            bridge = group.content_bridge
-            url = bridge.reverse('wiki_article', group, kwargs={'title': title, })
-        else:
-            url = reverse('wiki_article', kwargs={'title': title, })
+        url = article_url(title, group)
+        if not inside and existing is not None and title not in existing:
+            return """<a class="new" href="{0}">{1}</a>""".format(url, title)
     if inside:
         return url
     return """<a href="{0}">{1}</a>""".format(url, title)
 
 
+def _attr_value(match):
+    """Returns the value of an attribute matched by href_attr or class_attr."""
+    for value in match.group(2, 3, 4):
+        if value is not None:
+            return value
+
+
+def _href_title(tag):
+    """Returns the article title the href of a link tag names, if any."""
+    match = href_attr.search(tag)
+    if match is None:
+        return None
+    match = wikiword_link_href.match(_attr_value(match))
+    if match is None or match.group(1)[0] in ('!', '.', '/'):
+        return None
+    return match.group(1)
+
+
+def _add_new_class(tag):
+    """Adds the class "new" to a link tag."""
+    match = class_attr.search(tag)
+    if match is None:
+        return '<a class="new"' + tag[2:]
+    quote = "'" if match.group(3) is not None else '"'
+    return '{0}{1}{2}{3} new{2}{4}'.format(
+        tag[:match.start()], match.group(1), quote, _attr_value(match), tag[match.end():]
+    )
+
+
+def _href_callback(match, group=None):
+    """Rewrites the href of a link if it is a wiki word."""
+    value = _attr_value(match)
+    new_value = wikiword_link_href.sub(curry(_re_callback, inside=True, group=group), value)
+    if new_value == value:
+        return match.group(0)
+    quote = "'" if match.group(3) is not None else '"'
+    return '{0}{1}{2}{1}'.format(match.group(1), quote, new_value)
+
+
+def _tokens(html):
+    """Yields (piece, kind) for the pieces of html in a single pass over its
+    tags. kind is 'text' for text that may hold wiki words, 'link' for the
+    opening tag of a link and None for everything else; text inside links,
+    comments, scripts and styles is None.
+    """
+    in_link = 0
+    raw_text = None
+    pos = 0
+    for match in tag_or_comment.finditer(html):
+        text = html[pos:match.start()]
+        pos = match.end()
+        if text:
+            yield text, None if in_link or raw_text else 'text'
+
+        tag = match.group(0)
+        name = (match.group(2) or '').lower()
+        closing = match.group(1) == '/'
+        if raw_text:
+            if closing and name == raw_text:
+                raw_text = None
+            yield tag, None
+        elif name == 'a':
+            if closing:
+                in_link = max(in_link - 1, 0)
+                yield tag, None
+            else:
+                if not tag.endswith('/>'):
+                    in_link += 1
+                yield tag, 'link'
+        else:
+            if name in raw_text_elements and not closing:
+                raw_text = name
+            yield tag, None
+
+    text = html[pos:]
+    if text:
+        yield text, None if in_link or raw_text else 'text'
+
+
+def rewrite_links(html, group=None, existing=None):
+    """Yields the pieces of html with wiki words in its text turned into links
+    and wiki words in the href of its links turned into urls.
+
+    When existing, the set of titles of the group's articles, is given links
+    to missing articles get the class "new".
+    """
+    text_callback = curry(_re_callback, inside=False, group=group, existing=existing)
+    href_callback = curry(_href_callback, group=group)
+    for piece, kind in _tokens(html):
+        if kind == 'text':
+            yield wikiword_link.sub(text_callback, piece)
+        elif kind == 'link':
+            link = href_attr.sub(href_callback, piece)
+            if existing is not None and link != piece:
+                title = _href_title(piece)
+                if title is not None and title not in existing:
+                    link = _add_new_class(link)
+            yield link
+        else:
+            yield piece
+
+
+def wiki_words(html):
+    """Returns the set of article titles rewrite_links would link to, from
+    wiki words in text and in the href of links."""
+    titles = set()
+    for piece, kind in _tokens(html):
+        if kind == 'text':
+            for match in wikiword_link.finditer(piece):
+                title = match.group(1)
+                if title[0] not in ('!', '.', '/'):
+                    titles.add(title)
+        elif kind == 'link':
+            title = _href_title(piece)
+            if title is not None:
+                titles.add(title)
+    return titles
+
+
 @register.filter
 @stringfilter
 def wiki_links(text, group=None):
     """Replaces CamelCase words to wiki-links."""
-    from BeautifulSoup import BeautifulSoup
-
-    autoescape = False
     safe_input = isinstance(text, SafeData)
-    conditional_escape(text)
-    soup = BeautifulSoup(text)
-
-    for url in soup.findAll(text=wikiword_link):
-        if url.parent.name == 'a':
-            continue
-        new_str = wikiword_link.sub(curry(_re_callback, inside=False, group=group), url)
-        url.replaceWith(BeautifulSoup(new_str))
-
-    soup = BeautifulSoup(str(soup))  # Fixed for bug in some versions of BS
-    for a in soup.findAll('a'):
-        url = a.get('href')
-        if not url:
-            continue
-        new_str = wikiword_link_href.sub(curry(_re_callback, inside=True, group=group), url)
-        if new_str != url:
-            a['href'] = new_str
-
-    result = force_unicode(soup)
+    result = ''.join(rewrite_links(text, group))
     if safe_input:
         result = mark_safe(result)
-    elif autoescape:
-        result = escape(result)
     return result
 
 
+@register.filter
+def article_html(article):
+    """Returns the rendered body of an article, cached per revision."""
+    return rendered_content(article)
+
+
 @register.inclusion_tag('wiki/article_teaser.html', takes_context=True)
 def show_teaser(context, article):
     """ Show a teaser box for the summary of the article.
@@ -8,10 +8,20 @@ from django.db import models
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.test import TestCase
+from django.test.client import RequestFactory
+
+from cache_tagging.django_cache_tagging import cache
 
 from groups.base import Group
 from groups.bridge import ContentBridge
+from pinax.apps.wiki.diffs import Diff, revision_diff
+from pinax.apps.wiki.models import Article
+from pinax.apps.wiki.rendering import render_cache_key, rendered_content
+from pinax.apps.wiki.search import search_articles
+from pinax.apps.wiki.templatetags.wiki_markup import render_content
 from pinax.apps.wiki.templatetags.wiki_tags import wiki_links
+from pinax.apps.wiki.views import ArticleEditLock
+from versioning.models import Revision
 
 
 class TestWikiGroup(Group):
@@ -245,3 +255,194 @@ class WikiTest(TestCase):
             wiki_links('слово <a href="!../../../ПримернаяСтраница/СубСтраница">текст</a> слово', self.group),
             'слово <a href="../../../ПримернаяСтраница/СубСтраница">текст</a> слово'
         )
+
+    def test_wiki_links_skips_links_and_comments(self):
+        self.assertEqual(
+            wiki_links('<a href="/">ПримернаяСтраница <b>СубСтраница</b></a> <!-- ПримернаяСтраница -->', self.group),
+            '<a href="/">ПримернаяСтраница <b>СубСтраница</b></a> <!-- ПримернаяСтраница -->'
+        )
+        self.assertEqual(
+            wiki_links("<a href='!ПримернаяСтраница'>текст</a>", self.group),
+            "<a href='ПримернаяСтраница'>текст</a>"
+        )
+
+    def test_rendered_content(self):
+        article = Article(title='ПримернаяСтраница', content='see **OtherPage**',
+                          markup='creole', creator=self.user)
+        article.group = self.group
+        article.save()
+
+        # rendered on save
+        html = rendered_content(article)
+        # the creole emitter writes <b> and <i>, not <strong> and <em>
+        self.assertTrue('<b><a class="new" href=' in html)
+        self.assertTrue('/testwikigroup/test/wiki/OtherPage/' in html)
+        key = render_cache_key(article)
+        self.assertEqual(cache.get(key), html)
+
+        article.content = 'see //ThirdPage//'
+        article.save()
+        self.assertNotEqual(render_cache_key(article), key)
+        self.assertTrue('<i><a class="new" href=' in rendered_content(article))
+
+        # render_content serves the same HTML for the body of an article
+        self.assertEqual(render_content(article), {'rendered': rendered_content(article)})
+        self.assertEqual(render_content(article, 'summary'), {
+            'content': article.summary,
+            'markup': 'creole',
+        })
+
+    def test_red_links(self):
+        article = Article(title='ПримернаяСтраница', content='see OtherPage',
+                          markup='creole', creator=self.user)
+        article.group = self.group
+        article.save()
+        self.assertTrue('class="new"' in rendered_content(article))
+
+        other = Article(title='OtherPage', content='here', markup='creole',
+                        creator=self.user)
+        other.group = self.group
+        other.save()
+        self.assertFalse('class="new"' in rendered_content(article))
+
+        other.mark_removed()
+        self.assertTrue('class="new"' in rendered_content(article))
+
+    def test_red_links_in_links(self):
+        article = Article(title='ПримернаяСтраница', content='see [[OtherPage|the other page]]',
+                          markup='creole', creator=self.user)
+        article.group = self.group
+        article.save()
+        self.assertTrue('<a class="new" href="/testwikigroup/test/wiki/OtherPage/">'
+                        in rendered_content(article))
+
+        other = Article(title='OtherPage', content='here', markup='creole',
+                        creator=self.user)
+        other.group = self.group
+        other.save()
+        self.assertTrue('<a href="/testwikigroup/test/wiki/OtherPage/">'
+                        in rendered_content(article))
+
+    def test_search(self):
+        for title, content in (('GardenTools', 'rakes and spades'),
+                               ('SpadeWork', 'digging with a spade'),
+                               ('OtherPage', 'a spade is a spade')):
+            article = Article(title=title, content=content, creator=self.user)
+            article.group = self.group
+            article.save()
+        articles = self.group.content_objects(Article.non_removed_objects.all())
+
+        results = search_articles('spades', articles)
+        self.assertEqual(results.count(), 1)
+        self.assertEqual(results[0].title, 'GardenTools')
+        self.assertTrue('<b>spades</b>' in results[0].search_snippet)
+
+        # title words rank above content words
+        results = search_articles('spade', articles)
+        self.assertEqual([a.title for a in results], ['SpadeWork', 'OtherPage'])
+        results = search_articles('work digging', articles)
+        self.assertEqual([a.title for a in results], ['SpadeWork'])
+
+        # removed articles leave the index
+        Article.objects.get(title='SpadeWork').mark_removed()
+        self.assertEqual(search_articles('spade', articles).count(), 1)
+
+        # other groups are not searched
+        self.assertEqual(search_articles('spades', Article.objects.filter(object_id=None)).count(), 0)
+
+    def test_with_latest_revision(self):
+        for title in ('FirstPage', 'SecondPage', 'ThirdPage'):
+            article = Article(title=title, content='one', creator=self.user)
+            article.group = self.group
+            article.save()
+            article.content = 'two'
+            article.save()
+        articles = self.group.content_objects(Article.objects.all())
+
+        expected = dict(
+            (article.pk, article.latest_changeset()) for article in articles
+        )
+        # articles, revision ids, revisions, groups
+        with self.assertNumQueries(4):
+            prefetched = list(articles.order_by('title').with_latest_revision())
+        with self.assertNumQueries(0):
+            for article in prefetched:
+                self.assertEqual(article.latest_changeset(), expected[article.pk])
+                self.assertEqual(article.group, self.group)
+
+    def test_edit_lock(self):
+        factory = RequestFactory()
+        mine = factory.get('/')
+        mine.user = self.user
+        theirs = factory.get('/')
+        theirs.user = self.creator
+        ArticleEditLock.unlock('LockedPage')
+
+        lock = ArticleEditLock.get('LockedPage', mine)
+        self.assertTrue(lock.is_mine(mine))
+        # the second editor gets the first one's lock
+        lock = ArticleEditLock.get('LockedPage', theirs)
+        self.assertFalse(lock.is_mine(theirs))
+        self.assertEqual(lock.user_id, self.user.pk)
+
+        # only the holder can renew or release it
+        self.assertFalse(ArticleEditLock.renew('LockedPage', theirs).is_mine(theirs))
+        ArticleEditLock.unlock('LockedPage', theirs)
+        self.assertTrue(ArticleEditLock.get('LockedPage', mine).is_mine(mine))
+        ArticleEditLock.unlock('LockedPage', mine)
+        self.assertTrue(ArticleEditLock.get('LockedPage', theirs).is_mine(theirs))
+        ArticleEditLock.unlock('LockedPage')
+
+    def test_diff(self):
+        diff = Diff('one\ntwo\nthree\nfour', 'one\n2\nthree\nfour\nfive')
+        self.assertEqual(diff.unified(context=1), [
+            '--- ',
+            '+++ ',
+            '@@ -1,4 +1,5 @@',
+            ' one',
+            '-two',
+            '+2',
+            ' three',
+            ' four',
+            '+five',
+        ])
+        self.assertEqual(diff.side_by_side(context=0), [
+            ('replace', 2, 'two', 2, '2'),
+            ('insert', None, None, 5, 'five'),
+        ])
+        self.assertFalse(Diff('same', 'same').has_changes())
+
+    def test_revision_diff_is_cached(self):
+        article = Article(title='DiffPage', content='one\ntwo', creator=self.user)
+        article.group = self.group
+        article.save()
+        article.content = 'one\n2'
+        article.save()
+        first, second = Revision.objects.filter(
+            object_id=article.pk
+        ).order_by('revision')[:2]
+
+        loaded = []
+
+        def content(revision):
+            loaded.append(revision.revision)
+            return article.content_at(revision)
+
+        cache.delete('wiki.diff:{0}:{1}'.format(first.pk, second.pk))
+        diff = revision_diff(first, second, content)
+        self.assertEqual(diff.side_by_side(), [
+            ('equal', 1, 'one', 1, 'one'),
+            ('replace', 2, 'two', 2, '2'),
+        ])
+        self.assertEqual(len(loaded), 2)
+
+        # the second time, the revisions aren't loaded
+        cached = revision_diff(first, second, content)
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(cached.opcodes, diff.opcodes)
+
+        response = self.client.get('/testwikigroup/test/wiki/diff/DiffPage/{0}/{1}/'.format(
+            first.revision, second.revision
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['rows'], diff.side_by_side(context=3))
@@ -13,6 +13,10 @@ urlpatterns = patterns('pinax.apps.wiki.views',
         name='wiki_article'),
     url(r'^edit/(?P<title>' + WIKI_URL_RE + r')/$', 'edit_article',
         name='wiki_edit'),
+    url(r'^edit/(?P<title>' + WIKI_URL_RE + r')/heartbeat/$', 'edit_heartbeat',
+        name='wiki_edit_heartbeat'),
     url(r'^remove/(?P<title>' + WIKI_URL_RE + r')/$', 'remove_article',
         name='wiki_remove_article'),
+    url(r'^diff/(?P<title>' + WIKI_URL_RE + r')/(?P<from_revision>\d+)/(?P<to_revision>\d+)/$',
+        'article_diff', name='wiki_diff'),
 )
@@ -1,10 +1,13 @@
 """ Some util functions.
 """
 from __future__ import absolute_import, unicode_literals
+
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.decorators import login_required as _login_required
 
+from pinax.utils.search import WORD_RE, search_terms as _search_terms
+
 
 def get_ct(obj):
     """ Return the ContentType of the object's model.
@@ -16,3 +19,10 @@ def login_required(function):
     if getattr(settings, 'WIKI_REQUIRES_LOGIN', False):
         return _login_required(function)
     return function
+
+
+def search_terms(text):
+    """ Returns the search terms of a text: its lowercased words and the
+    parts of its CamelCase words, so 'WikiPage' is found by 'page' too.
+    """
+    return _search_terms(text, camel_case=True)
@@ -6,19 +6,22 @@ from datetime import datetime
 from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Q
 from django.core.cache import cache
 from django.template import RequestContext
 from django.core.urlresolvers import reverse
 from django.core.exceptions import PermissionDenied
-from django.http import (HttpResponseRedirect, HttpResponseNotAllowed,
-                         HttpResponseForbidden)
+from django.http import (HttpResponse, HttpResponseRedirect,
+                         HttpResponseNotAllowed, HttpResponseForbidden, Http404)
 from django.shortcuts import render_to_response
+from django.utils import simplejson
 from django.utils.translation import ugettext_lazy as _
 
+from pinax.apps.wiki.diffs import revision_diff
 from pinax.apps.wiki.forms import ArticleForm, SearchForm
 from pinax.apps.wiki.models import Article
+from pinax.apps.wiki.search import search_articles
 from pinax.apps.wiki.utils import get_ct, login_required
+from versioning.models import Revision
 
 
 # Settings
@@ -99,13 +102,19 @@ def get_url(urlname, group=None, args=None, kw=None, bridge=None):
 
 class ArticleEditLock(object):
     """ A soft lock to edting an article.
+
+    The cache holds a small payload (user id, IP address, time the lock was
+    taken) rather than the lock itself. It is taken with cache.add, so of two
+    editors opening an article at once only one gets it, and it is kept
+    alive by the edit page calling the heartbeat view.
     """
 
-    def __init__(self, title, request, message_template=None):
+    def __init__(self, title, user_id, user_ip, created_at,
+                 message_template=None):
         self.title = title
-        self.user_ip = get_real_ip(request)
-        self.user = request.user
-        self.created_at = datetime.now()
+        self.user_id = user_id
+        self.user_ip = user_ip
+        self.created_at = created_at
 
         if message_template is None:
             message_template = _('Possible edit conflict:' +\
@@ -113,39 +122,91 @@ class ArticleEditLock(object):
 
         self.message_template = message_template
 
-        cache.set(self.__class__.get_cache_name(title), self,
-                  WIKI_LOCK_DURATION * 60)
+    @classmethod
+    def for_request(cls, title, request, message_template=None):
+        """ A lock on title held by the requesting user."""
+        return cls(title, request.user.pk, get_real_ip(request),
+                   datetime.now(), message_template)
 
     @classmethod
     def get(cls, title, request, message_template=None):
-        instance = cache.get(cls.get_cache_name(title), None)
-        if instance is None:
-            instance = cls(title, request, message_template)
-        return instance
+        """ Returns the lock on title, taking it for the requesting user if
+        nobody holds it.
+        """
+        key = cls.get_cache_name(title)
+        lock = cls.for_request(title, request, message_template)
+        # the lock may expire between add and get; then try again
+        for attempt in range(2):
+            if cache.add(key, lock.dumps(), WIKI_LOCK_DURATION * 60):
+                return lock
+            current = cls.loads(title, cache.get(key), message_template)
+            if current is not None:
+                return current
+        return lock
+
+    @classmethod
+    def renew(cls, title, request):
+        """ Extends the lock on title if the requesting user holds it, or
+        takes it if nobody does. Returns the lock.
+        """
+        lock = cls.get(title, request)
+        if lock.is_mine(request):
+            cache.set(cls.get_cache_name(title), lock.dumps(),
+                      WIKI_LOCK_DURATION * 60)
+        return lock
 
     @classmethod
-    def unlock(cls, title):
-        cache.delete(cls.get_cache_name(title))
+    def unlock(cls, title, request=None):
+        """ Releases the lock on title; given a request, only when the
+        requesting user holds it.
+        """
+        key = cls.get_cache_name(title)
+        if request is not None:
+            lock = cls.loads(title, cache.get(key))
+            if lock is None or not lock.is_mine(request):
+                return
+        cache.delete(key)
 
     @classmethod
     def get_cache_name(cls, name):
         name_hash = hashlib.md5(str(name).encode('utf-8')).hexdigest()
         return 'wiki_article_lock_{0}'.format(name_hash)
 
+    def dumps(self):
+        return '{0}|{1}|{2}'.format(
+            self.user_id or '',
+            self.user_ip or '',
+            self.created_at.strftime('%Y-%m-%dT%H:%M:%S')
+        )
+
+    @classmethod
+    def loads(cls, title, payload, message_template=None):
+        try:
+            user_id, user_ip, created_at = payload.split('|')
+            return cls(title, int(user_id) if user_id else None,
+                       user_ip or None,
+                       datetime.strptime(created_at, '%Y-%m-%dT%H:%M:%S'),
+                       message_template)
+        except (AttributeError, ValueError):
+            return None
+
+    def minutes(self):
+        delt = datetime.now() - self.created_at
+        return int(delt.seconds / 60) or 1
+
     def create_message(self, request):
         """ Send a message to the user if there is another user
         editing this article.
         """
         if not self.is_mine(request):
-            delt = datetime.now() - self.created_at
             messages.warning(
                 request,
-                self.message_template % (int(delt.seconds / 60) or 1)
+                self.message_template % self.minutes()
             )
 
     def is_mine(self, request):
-        if self.user.is_authenticated() or request.user.is_authenticated():
-            return self.user == request.user
+        if self.user_id is not None or request.user.is_authenticated():
+            return self.user_id == request.user.pk
         return self.user_ip == get_real_ip(request)
 
 
@@ -192,7 +253,7 @@ def article_list(request,
         if not allow_read:
             return HttpResponseForbidden()
 
-        articles = articles.order_by('-created_at')
+        articles = articles.order_by('-created_at').with_latest_revision()
 
         search_form = SearchFormClass()
 
@@ -265,6 +326,55 @@ def view_article(request, title,
     return HttpResponseNotAllowed(['GET'])
 
 
+def article_diff(request, title, from_revision, to_revision,
+                 group_slug=None, bridge=None,
+                 article_qs=ALL_ARTICLES,
+                 template_name='diff.html',
+                 template_dir='wiki',
+                 extra_context=None,
+                 is_member=None,
+                 is_private=None,
+                 *args, **kw):
+    """ Shows the changes to an article between two of its revisions."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    group, bridge = group_and_bridge(request)
+    if not has_read_perm(request.user, group, is_member, is_private):
+        return HttpResponseForbidden()
+    try:
+        article = article_qs.get_by(title, group)
+    except Article.DoesNotExist:
+        raise Http404
+    if not request.user.has_perm('wiki.browse_revision_article', article):
+        return HttpResponseForbidden()
+
+    revisions = dict((revision.revision, revision) for revision in Revision.objects.filter(
+        content_type=get_ct(article),
+        object_id=article.pk,
+        revision__in=[from_revision, to_revision],
+    ).select_related('editor'))
+    try:
+        from_revision = revisions[int(from_revision)]
+        to_revision = revisions[int(to_revision)]
+    except KeyError:
+        raise Http404
+
+    diff = revision_diff(from_revision, to_revision, article.content_at)
+    template_params = {'article': article,
+                       'from_revision': from_revision,
+                       'to_revision': to_revision,
+                       'has_changes': diff.has_changes(),
+                       'rows': diff.side_by_side(context=3),
+                       'group': group}
+    if extra_context is not None:
+        template_params.update(extra_context)
+
+    return render_to_response(os.path.join(template_dir, template_name),
+                              template_params,
+                              context_instance=RequestContext(request))
+
+
 @login_required
 def edit_article(request, title,
                  group_slug=None, bridge=None,
@@ -310,7 +420,7 @@ def edit_article(request, title,
                 form.group = group
 
             new_article = form.save()
-            ArticleEditLock.unlock(title)
+            ArticleEditLock.unlock(title, request)
 
             url = get_url('wiki_article', group, kw={
                 'title': new_article.title,
@@ -340,7 +450,10 @@ def edit_article(request, title,
             form = ArticleFormClass(instance=article,
                                     initial=initial)
 
-    template_params = {'form': form}
+    template_params = {'form': form,
+                       'title': title,
+                       # milliseconds between heartbeats of the edit page
+                       'lock_heartbeat': WIKI_LOCK_DURATION * 60 * 1000 // 3}
 
     template_params['group'] = group
     if extra_context is not None:
@@ -351,6 +464,27 @@ def edit_article(request, title,
                               context_instance=RequestContext(request))
 
 
+@login_required
+def edit_heartbeat(request, title,
+                   group_slug=None, bridge=None,
+                   article_qs=ALL_ARTICLES,
+                   is_member=None,
+                   *args, **kw):
+    """ Called by the edit page while it is open to keep the edit lock;
+    answers whether the requesting user still holds it.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    group, bridge = group_and_bridge(request)
+    if not has_write_perm(request.user, group, is_member):
+        return HttpResponseForbidden()
+
+    lock = ArticleEditLock.renew(title, request)
+    data = {'mine': lock.is_mine(request), 'minutes': lock.minutes()}
+    return HttpResponse(simplejson.dumps(data), mimetype='application/json')
+
+
 @login_required
 def remove_article(request, title,
                    group_slug=None, bridge=None,
@@ -430,7 +564,6 @@ def search_article(request,
 
                 articles, group = get_articles_by_group(article_qs, group,
                                                         bridge)
-                articles = articles.order_by('-created_at')
 
                 url = None
                 if title_only:
@@ -439,20 +572,20 @@ def search_article(request,
                         'title': search_term,
                     }, bridge=bridge)
                 else:
-                    articles_by_content = articles.filter(
-                        Q(content__icontains=search_term)
-                        | Q(summary__icontains=search_term))
+                    articles_by_content = search_articles(search_term,
+                                                          articles)
 
                     try:
                         article_by_title = articles.get_by(search_term, group)
                     except ObjectDoesNotExist:
                         pass
 
+                    # the count is kept for the paginator
                     if article_by_title is not None:
                         if not articles_by_content.count():
                             url = article_by_title.get_absolute_url()
                     elif articles_by_content.count() == 1:
-                        url = articles_by_content.get().get_absolute_url()
+                        url = articles_by_content[0].get_absolute_url()
 
                 if url is not None:
                     return HttpResponseRedirect(url)
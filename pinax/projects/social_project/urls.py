@@ -60,7 +60,7 @@ urlpatterns = patterns("",
     url(r"^flag/", include("flag.urls")),
     url(r"^locations/", include("locations.urls")),
     url(r"^feeds/tweets/(.*)/$", "django.contrib.syndication.views.feed", tweets_feed_dict),
-    url(r"^feeds/posts/(.*)/$", "django.contrib.syndication.views.feed", blogs_feed_dict),
+    url(r"^feeds/posts/(.*)/$", "pinax.utils.feeds.feed", blogs_feed_dict),
     url(r"^feeds/bookmarks/(.*)/?$", "django.contrib.syndication.views.feed", bookmarks_feed_dict),
 )
 
@@ -68,7 +68,7 @@ urlpatterns = patterns("",
 
 friends_photos_kwargs = {
     "template_name": "photos/friends_photos.html",
-    "friends_objects_function": lambda users: Image.objects.filter(is_public=True, member__in=users),
+    "friends_objects_function": lambda users: Image.objects.with_groups().filter(is_public=True, member__in=users),
 }
 
 friends_blogs_kwargs = {
@@ -0,0 +1,164 @@
+from __future__ import absolute_import, unicode_literals
+import hashlib
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseNotModified, Http404
+from django.utils import translation
+from django.utils.http import http_date, parse_http_date_safe, quote_etag, parse_etags
+
+from cache_tagging.django_cache_tagging import cache
+
+FEED_CACHE_TIMEOUT = getattr(settings, "PINAX_FEED_CACHE_TIMEOUT", 60 * 60)
+
+# Atom requires an updated date, even for a feed without entries; an
+# arbitrary static one keeps the document of an empty feed stable
+EMPTY_FEED_UPDATED = datetime(year=2008, month=7, day=1)
+
+
+class CachedFeed(object):
+    """
+    Mixin for atomformat feeds answering conditional GETs and serving
+    cached documents, through the feed view below.
+
+    Subclasses define state_queryset(obj), the items the feed is made of,
+    updated_field, the field of those items telling when they last changed,
+    and cache_tags, the cache_tagging tags invalidated when they change.
+    The ETag and Last-Modified of a feed come from a single aggregate query
+    over state_queryset, which also answers feed_updated, and from a version
+    per cache tag that touch_feeds changes.
+    """
+
+    updated_field = None
+    cache_tags = []
+
+    def state_queryset(self, obj=None):
+        """Returns the items of the feed for obj, the object get_object
+        returned. Every subclass must define it; the ETag and Last-Modified
+        of the feed are computed from it."""
+        raise NotImplementedError(
+            "{0} must define state_queryset(obj)".format(self.__class__.__name__)
+        )
+
+    def feed_state(self, obj=None):
+        """Returns the number of items of the feed and when the latest of
+        them changed, with one query per feed instance."""
+        if not hasattr(self, "_feed_state"):
+            state = self.state_queryset(obj).order_by().aggregate(
+                count=Count("pk"),
+                updated=Max(self.updated_field),
+            )
+            self._feed_state = (state["count"], state["updated"] or EMPTY_FEED_UPDATED)
+        return self._feed_state
+
+    def last_modified(self, obj=None):
+        return self.feed_state(obj)[1]
+
+    def feed_version(self):
+        return ":".join(
+            cache.get(feed_version_key(tag)) or "" for tag in self.cache_tags
+        )
+
+    def etag(self, path, obj=None):
+        count, updated = self.feed_state(obj)
+        return hashlib.md5("{0}:{1}:{2}:{3}:{4}".format(
+            path, translation.get_language(), count, updated.isoformat(),
+            self.feed_version()
+        ).encode("utf-8")).hexdigest()
+
+    @property
+    def domain(self):
+        # item_id and feed_id ask for it once per entry
+        if not hasattr(self, "_domain"):
+            self._domain = Site.objects.get_current().domain
+        return self._domain
+
+
+def feed_version_key(tag):
+    return "feeds.version:{0}".format(tag)
+
+
+def touch_feeds(*tags):
+    """
+    Gives the feeds cached under tags new ETags and drops their documents,
+    for changes to their items that the aggregate over updated_field can't
+    see, like the permalinks of posts whose author was renamed.
+    """
+    for tag in tags:
+        cache.set(feed_version_key(tag), uuid.uuid4().hex, timeout=FEED_CACHE_TIMEOUT)
+    cache.invalidate_tags(*tags)
+
+
+def timestamp(dt):
+    # datetimes are naive, in settings.TIME_ZONE
+    return int(time.mktime(dt.timetuple()))
+
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return etag in etags or "*" in etags
+    if_modified_since = request.META.get("HTTP_IF_MODIFIED_SINCE")
+    if if_modified_since is not None:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        return if_modified_since is not None and timestamp(last_modified) <= if_modified_since
+    return False
+
+
+def render_feed(feed, param):
+    try:
+        feedgen = feed.get_feed(param)
+    except ObjectDoesNotExist:
+        raise Http404("Invalid feed parameters.")
+    response = HttpResponse(mimetype=feedgen.mime_type)
+    feedgen.write(response, "utf-8")
+    return response
+
+
+def feed(request, url, feed_dict=None):
+    """
+    Serves the feeds of feed_dict like django.contrib.syndication.views.feed,
+    answering 304 Not Modified for a CachedFeed that didn't change since the
+    client last fetched it, and otherwise the document cached for its ETag.
+    """
+    if not feed_dict:
+        raise Http404("No feeds are registered.")
+    try:
+        slug, param = url.split("/", 1)
+    except ValueError:
+        slug, param = url, ""
+    try:
+        feed_class = feed_dict[slug]
+    except KeyError:
+        raise Http404("Slug {0!r} isn't registered.".format(slug))
+    feed = feed_class(slug, request)
+
+    if not isinstance(feed, CachedFeed):
+        return render_feed(feed, param)
+
+    try:
+        obj = feed.get_object(param.split("/") if param else [])
+    except ObjectDoesNotExist:
+        raise Http404("Invalid feed parameters.")
+    etag = feed.etag(request.path, obj)
+    last_modified = feed.last_modified(obj)
+
+    if not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+    else:
+        key = "feeds:{0}".format(etag)
+        document = cache.get(key)
+        if document is None:
+            response = render_feed(feed, param)
+            document = (response["Content-Type"], response.content)
+            cache.set(key, document, tags=feed.cache_tags, timeout=FEED_CACHE_TIMEOUT)
+        response = HttpResponse(document[1], content_type=document[0])
+    response["ETag"] = quote_etag(etag)
+    response["Last-Modified"] = http_date(timestamp(last_modified))
+    return response
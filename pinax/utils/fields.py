@@ -0,0 +1,20 @@
+from __future__ import absolute_import, unicode_literals
+from django.db import models
+from django.db.models import F
+
+
+class KeptOnSaveMixin(object):
+    """
+    A column Model.save() leaves alone once the row exists: the update sets
+    it to itself, so a stale instance can't write an old value back. Only
+    QuerySet.update() changes it.
+    """
+
+    def pre_save(self, model_instance, add):
+        if add:
+            return super(KeptOnSaveMixin, self).pre_save(model_instance, add)
+        return F(self.attname)
+
+
+class KeptBooleanField(KeptOnSaveMixin, models.BooleanField):
+    pass
@@ -0,0 +1,72 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Fetching the related objects of a list of objects with a constant number of
+queries, instead of one or more queries per object.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.query import QuerySet
+
+
+class PrefetchQuerySet(QuerySet):
+    """
+    A QuerySet handing the objects it reads to prefetch functions, one chunk
+    at a time, before yielding them. A prefetch function takes a list of
+    objects and sets what they refer to on them.
+    """
+
+    # objects read per chunk when prefetching
+    PREFETCH_CHUNK_SIZE = 100
+
+    _prefetch = ()
+
+    def prefetch(self, func):
+        clone = self._clone()
+        if func not in clone._prefetch:
+            clone._prefetch = clone._prefetch + (func,)
+        return clone
+
+    def _clone(self, *args, **kwargs):
+        clone = super(PrefetchQuerySet, self)._clone(*args, **kwargs)
+        clone._prefetch = self._prefetch
+        return clone
+
+    def iterator(self):
+        objects = super(PrefetchQuerySet, self).iterator()
+        if not self._prefetch:
+            for obj in objects:
+                yield obj
+            return
+        chunk = []
+        for obj in objects:
+            chunk.append(obj)
+            if len(chunk) == self.PREFETCH_CHUNK_SIZE:
+                for obj in self._run_prefetch(chunk):
+                    yield obj
+                chunk = []
+        for obj in self._run_prefetch(chunk):
+            yield obj
+
+    def _run_prefetch(self, chunk):
+        if chunk:
+            for func in self._prefetch:
+                func(chunk)
+        return chunk
+
+
+def generic_objects(keys, base=None):
+    """
+    Returns the objects of keys, (content type id, object id) pairs, by
+    pair, with one query per content type. With base, objects of models
+    that don't subclass it are left out.
+    """
+    object_ids = {}
+    for content_type_id, object_id in keys:
+        object_ids.setdefault(content_type_id, set()).add(object_id)
+    objects = {}
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None or (base is not None and not issubclass(model, base)):
+            continue
+        for obj in model._default_manager.filter(pk__in=ids):
+            objects[(content_type_id, obj.pk)] = obj
+    return objects
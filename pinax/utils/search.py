@@ -0,0 +1,108 @@
+from __future__ import absolute_import, unicode_literals
+"""
+Inverted indexes for ranked search.
+
+A term model has a foreign key to the indexed objects, a term and a weight,
+the number of times the term appears in the object, each field counting
+with its own weight. An object matches a query when it has every term of
+the query, and matches rank by the summed weight of those terms.
+"""
+import re
+
+from django.db import models
+from django.db.models import Count, Sum
+
+WORD_RE = re.compile(r"\w+", re.U)
+
+# longest term kept, the max_length of the term fields
+MAX_TERM_LENGTH = 50
+
+
+def camel_case_parts(word):
+    """Splits 'WikiPage' into ['Wiki', 'Page']."""
+    parts = []
+    start = 0
+    for i in range(1, len(word)):
+        if word[i].isupper() and not word[i - 1].isupper():
+            parts.append(word[start:i])
+            start = i
+    parts.append(word[start:])
+    return parts
+
+
+def search_terms(text, camel_case=False):
+    """
+    Returns the search terms of a text: its lowercased words of two letters
+    or more. With camel_case, the parts of CamelCase words are terms too, so
+    'WikiPage' is found by 'page'.
+    """
+    terms = []
+    for word in WORD_RE.findall(text or ""):
+        if 1 < len(word) <= MAX_TERM_LENGTH:
+            terms.append(word.lower())
+        if camel_case:
+            parts = camel_case_parts(word)
+            if len(parts) > 1:
+                terms.extend(part.lower() for part in parts if 1 < len(part) <= MAX_TERM_LENGTH)
+    return terms
+
+
+class TermManager(models.Manager):
+    """
+    Manager of a term model. Subclasses set object_field, the name of the
+    foreign key to the indexed objects, and FIELD_WEIGHTS, how much an
+    occurrence of a term counts in each field of those objects.
+    """
+
+    object_field = None
+    FIELD_WEIGHTS = ()
+
+    def terms(self, text):
+        return search_terms(text)
+
+    def weights(self, obj):
+        weights = {}
+        for field, weight in self.FIELD_WEIGHTS:
+            for term in self.terms(getattr(obj, field)):
+                weights[term] = weights.get(term, 0) + weight
+        return weights
+
+    def index(self, obj, **values):
+        """
+        Brings the terms of obj in line with its fields, touching only the
+        postings that changed. values are further fields of the term model,
+        the same for every term of obj.
+        """
+        weights = self.weights(obj)
+        postings = self.filter(**{self.object_field: obj})
+        current = dict(postings.values_list("term", "weight"))
+
+        stale = [term for term in current if term not in weights]
+        if stale:
+            postings.filter(term__in=stale).delete()
+        changed = {}
+        for term, weight in weights.items():
+            if term in current and current[term] != weight:
+                changed.setdefault(weight, []).append(term)
+        for weight, terms in changed.items():
+            postings.filter(term__in=terms).update(weight=weight)
+        for field, value in values.items():
+            postings.exclude(**{field: value}).update(**{field: value})
+        self.bulk_create([
+            self.model(term=term, weight=weight, **dict(values, **{self.object_field: obj}))
+            for term, weight in weights.items()
+            if term not in current
+        ])
+
+    def matches(self, terms, objects, **values):
+        """
+        Returns the rows of the objects of the queryset objects having every
+        one of terms, with their summed weights as score.
+        """
+        return self.filter(
+            term__in=list(terms),
+            **dict(values, **{"{0}__in".format(self.object_field): objects.values("pk")})
+        ).values(self.object_field).annotate(
+            matched=Count("term"),
+            score=Sum("weight"),
+        ).filter(matched=len(terms))
@@ -0,0 +1,86 @@
+from __future__ import absolute_import, unicode_literals
+import logging
+import threading
+
+try:
+    import queue  # Python 3.*
+except ImportError:
+    import Queue as queue
+
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool(object):
+    """
+    A small pool of daemon threads working through a queue of jobs, so work
+    like notification fan-out happens outside the request. A pool of size 0
+    runs every job inline, which is what tests and management commands want.
+
+    Delivery isn't durable: the queue only lives in memory and daemon
+    threads die with the process, so jobs still queued at exit are lost.
+    Workers use their own database connections and don't see uncommitted
+    changes; submit jobs after the transaction they depend on is committed.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def submit(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) on a worker. Call it outside of open
+        transactions, see above."""
+        if not self.size:
+            func(*args, **kwargs)
+            return
+        self.start()
+        self.queue.put((func, args, kwargs))
+
+    def start(self):
+        """Starts (or restarts) the worker threads."""
+        with self.lock:
+            self.threads = [t for t in self.threads if t.is_alive()]
+            while len(self.threads) < self.size:
+                thread = threading.Thread(target=self.work)
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+
+    def join(self):
+        """Blocks until every submitted job has run."""
+        self.queue.join()
+
+    def work(self):
+        while True:
+            func, args, kwargs = self.queue.get()
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("background job %r failed", func)
+            finally:
+                self.queue.task_done()
+                # each thread has its own connection; don't leave it open
+                connection.close()
+
+
+def chunks(queryset, size):
+    """
+    Yields lists of the objects of queryset in primary key order, reading
+    size of them per query and starting each query after the last primary
+    key read, so a large audience is never held in memory at once.
+    """
+    queryset = queryset.order_by("pk")
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(pk__gt=last)
+        chunk = list(chunk[:size])
+        if not chunk:
+            break
+        yield chunk
+        last = chunk[-1].pk
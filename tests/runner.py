@@ -111,6 +111,11 @@ def setup_test_environment():
         ],
         "CONTACT_EMAIL": "feedback@example.com",
         "SITE_NAME": "Pinax",
+        
+        # deliver notifications inline; worker threads would not see the
+        # test database
+        "TASKS_NOTIFICATION_WORKERS": 0,
+        "BLOG_NOTIFICATION_WORKERS": 0,
     })
 
 